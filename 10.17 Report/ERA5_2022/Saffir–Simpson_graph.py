@@ -2,12 +2,17 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import cartopy.crs as ccrs
-import cartopy.feature as cfeature
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from stormtools.categories import categorize, category_names
+from stormtools.trackplot import add_basemap
 
 def categorize_wind_speed(df):
-    bins = [-np.inf, 17, 32, 42, 49, 58, 70, np.inf]
-    labels = ['TD', 'TS', 'Category 1', 'Category 2', 'Category 3', 'Category 4', 'Category 5']
-    df['category'] = pd.cut(df['wind_speed'], bins=bins, labels=labels, right=True)
+    # Same classes as pd.cut with the m/s bounds, from one np.digitize call
+    df['category'] = pd.Categorical.from_codes(categorize(df['wind_speed'].values, 'ms'),
+                                               categories=category_names('ms'))
     return df
 
 def plot_storm_tracks(df):
@@ -29,12 +34,8 @@ def plot_storm_tracks(df):
     plt.figure(figsize=(15, 10))
     ax = plt.axes(projection=ccrs.PlateCarree())
     ax.set_global()
-    ax.coastlines()
-    ax.add_feature(cfeature.LAND, facecolor='lightgray')
-    ax.add_feature(cfeature.OCEAN, facecolor='lightblue')
-    ax.add_feature(cfeature.BORDERS, linestyle=':', alpha=0.5)
-    ax.add_feature(cfeature.LAKES, alpha=0.5)
-    ax.add_feature(cfeature.RIVERS, alpha=0.5)
+    # Coastlines and Natural Earth features, rendered once and cached
+    add_basemap(ax)
 
 
     for category in labels:
@@ -2,23 +2,20 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import cartopy.crs as ccrs
-import cartopy.feature as cfeature
+import os
+import sys
 
-
-def haversine(lon1, lat1, lon2, lat2):  #Calculate the distance between two latitude and longitude points in kilometers
-    R = 6371.0  # The radius of the earth, in kilometers
-    lon1, lat1, lon2, lat2 = map(np.radians, [lon1, lat1, lon2, lat2])
-    dlon = lon2 - lon1
-    dlat = lat2 - lat1
-    a = np.sin(dlat / 2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2)**2
-    c = 2 * np.arcsin(np.sqrt(a))
-    return R * c
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from stormtools.categories import categorize, category_names, segments_by_category
+from stormtools.trackgeom import sort_tracks, track_segments
+from stormtools.trackplot import add_basemap, add_segments_by_color
+from stormtools.trackstore import load_tracks
 
 
 def categorize_wind_speed(df):
-    bins = [-np.inf, 17, 32, 42, 49, 58, 70, np.inf]
-    labels = ['TD', 'TS', 'Category 1', 'Category 2', 'Category 3', 'Category 4', 'Category 5']
-    df['category'] = pd.cut(df['wind_speed'], bins=bins, labels=labels, right=True)
+    # Same classes as pd.cut with the m/s bounds, from one np.digitize call
+    df['category'] = pd.Categorical.from_codes(categorize(df['wind_speed'].values, 'ms'),
+                                               categories=category_names('ms'))
     return df
 
 def plot_storm_tracks(df):
@@ -35,40 +32,17 @@ def plot_storm_tracks(df):
     plt.figure(figsize=(15, 10))
     ax = plt.axes(projection=ccrs.PlateCarree())
     ax.set_global()
-    ax.coastlines()
-    ax.add_feature(cfeature.LAND, facecolor='lightgray')
-    ax.add_feature(cfeature.OCEAN, facecolor='lightblue')
-    ax.add_feature(cfeature.BORDERS, linestyle=':', alpha=0.5)
-    ax.add_feature(cfeature.LAKES, alpha=0.5)
-    ax.add_feature(cfeature.RIVERS, alpha=0.5)
-
+    # Coastlines and Natural Earth features, rendered once and cached
+    add_basemap(ax)
 
-    grouped = df.groupby('fcst_ini_date')
-    for name, group in grouped:
-        group = group.sort_values('dates')
 
-        lons = group['lons'].values
-        lats = group['lats'].values
-        categories = group['category'].values
+    df = sort_tracks(df)
+    segments, index = track_segments(df['lons'].values, df['lats'].values, df['fcst_ini_date'].values,
+                                     max_distance_km=500)
 
-
-        for i in range(len(lons) - 1):
-            dist = haversine(lons[i], lats[i], lons[i + 1], lats[i + 1])
-            if dist < 500: 
-                # Solve the problem of crossing 180 degrees longitude
-                lon_diff = abs(lons[i] - lons[i + 1])
-                if lon_diff > 180:
-                    lons[i + 1] = lons[i + 1] - 360 if lons[i + 1] > 0 else lons[i + 1] + 360
-                
-                color = category_colors.get(categories[i], 'black')
-                ax.plot(
-                    [lons[i], lons[i + 1]],
-                    [lats[i], lats[i + 1]],
-                    color=color,
-                    linewidth=1.5,
-                    transform=ccrs.PlateCarree(),
-                    alpha=0.7,
-                )
+    # Every segment takes the category of its first point; one collection per category
+    add_segments_by_color(ax, segments_by_category(segments, df['category'].cat.codes.values[index], 'ms'),
+                          linewidth=1.5, alpha=0.7)
     labels = ['TD', 'TS', 'Category 1', 'Category 2', 'Category 3', 'Category 4', 'Category 5']
     legend_elements = [plt.Line2D([0], [0], color=category_colors[label], lw=2, label=label) for label in labels]
     plt.legend(handles=legend_elements, title='Saffir-Simpson Category', loc='lower left', fontsize='medium')
@@ -81,24 +55,10 @@ def plot_storm_tracks(df):
 if __name__ == "__main__":
     data_file_path = '/home/cl4460/ERA5_2022/convert_dataset.dat'  
     try:
-        column_names = ['date', 'time', 'lats', 'lons', 'wind_speed', 'pa', 'fcst_ini_date_date', 'fcst_ini_date_time', 'lead_time_hours']
-        df = pd.read_csv(
-            data_file_path,
-            sep='\s+',            
-            header=None,         
-            names=column_names,  
-            on_bad_lines='skip'  
-        )
-
-        df['dates'] = df['date'] + ' ' + df['time']
-        df['fcst_ini_date'] = df['fcst_ini_date_date'] + ' ' + df['fcst_ini_date_time']
-        df = df.drop(columns=['date', 'time', 'fcst_ini_date_date', 'fcst_ini_date_time'])
-
-        df['lons'] = pd.to_numeric(df['lons'], errors='coerce')
-        df['lats'] = pd.to_numeric(df['lats'], errors='coerce')
-        df['wind_speed'] = pd.to_numeric(df['wind_speed'], errors='coerce')
+        # Date columns come back as datetime64, no string joining or re-parsing
+        df = load_tracks(data_file_path)
 
-        df['lons'] = df['lons'].apply(lambda x: x if x <= 180 else x - 360)
+        df['lons'] = np.where(df['lons'] <= 180, df['lons'], df['lons'] - 360)
         df_filtered = df[
             (df['lons'] >= -180) &
             (df['lons'] <= 180) &
@@ -108,8 +68,6 @@ if __name__ == "__main__":
 
         df_filtered = df_filtered.dropna(subset=['lons', 'lats', 'wind_speed', 'dates', 'fcst_ini_date'])
         df_filtered = categorize_wind_speed(df_filtered)
-        df_filtered['dates'] = pd.to_datetime(df_filtered['dates'], errors='coerce')
-        df_filtered['fcst_ini_date'] = pd.to_datetime(df_filtered['fcst_ini_date'], errors='coerce')
 
         plot_storm_tracks(df_filtered)
     except Exception as e:
@@ -1,16 +1,29 @@
 import os
-import pandas as pd
+import sys
 import matplotlib.pyplot as plt
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from stormtools.trackstore import load_tracks, open_track_archive
+
 folder_path = "/home/zy2608/TE_ready_07/0.7_resolution_processed_results/"
 
 results = []
 
 for file_name in os.listdir(folder_path):
-    if file_name.endswith(".csv"):
+    if file_name.endswith(".tracks"):
+        # The archive already holds the per-storm maximum wind and minimum pressure
+        storms = open_track_archive(os.path.join(folder_path, file_name))['storms']
+        for storm in storms[storms['n_points'] > 0]:
+            results.append({
+                'file': file_name,
+                'storm_id': storm['storm_id'],
+                'max_wind_speed': storm['max_wind_speed'],
+                'min_pa': storm['min_pa']
+            })
+    elif file_name.endswith((".npz", ".csv")):
         file_path = os.path.join(folder_path, file_name)
         
-        data = pd.read_csv(file_path)
+        data = load_tracks(file_path)
         
         if {'wind_speed', 'pa', 'storm_id'}.issubset(data.columns):
             grouped = data.groupby('storm_id').agg({
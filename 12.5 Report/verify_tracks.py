@@ -0,0 +1,41 @@
+import glob
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from stormtools.verification import skill_curves, verify_files
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+if __name__ == "__main__":
+    # Track files of the daily initializations, as written by label_data.py
+    data_dir = '/home/cl4460/NeuralGCM_1.4/processed_results'
+    ibtracs_path = '/home/zy2608/zy2608/9.22/IBTrACS.ALL.v04r01.nc'
+    file_list = sorted(glob.glob(os.path.join(data_dir, 'NeuralGCM_*_processed.npz')))
+    print(f"Verifying {len(file_list)} forecasts against IBTrACS.")
+
+    # Every initialization matched and aligned by lead time in one call
+    verification = verify_files(file_list, ibtracs_path=ibtracs_path)
+    curves = skill_curves(verification)
+    curves = curves[curves['samples'] > 0]
+    curves.to_csv('track_skill_curves.csv')
+
+    fig, (ax1, ax2) = plt.subplots(nrows=2, figsize=(10, 10), sharex=True)
+    ax1.plot(curves.index, curves['track_error_km'], color='black', label='Track error')
+    ax1.plot(curves.index, curves['along_track_bias_km'], color='royalblue', label='Along-track bias')
+    ax1.plot(curves.index, curves['cross_track_bias_km'], color='orange', label='Cross-track bias')
+    ax1.axhline(0, color='gray', linewidth=0.5)
+    ax1.set_ylabel('Error (km)')
+    ax1.legend()
+    ax1.grid(linestyle='--', alpha=0.7)
+    ax2.plot(curves.index, curves['wind_bias'], color='red', label='Wind bias')
+    ax2.plot(curves.index, curves['wind_mae'], color='red', linestyle='--', label='Wind MAE')
+    ax2.axhline(0, color='gray', linewidth=0.5)
+    ax2.set_xlabel('Lead time (hours)')
+    ax2.set_ylabel('Wind error (m/s)')
+    ax2.legend()
+    ax2.grid(linestyle='--', alpha=0.7)
+    fig.suptitle('NeuralGCM track and intensity errors by lead time')
+    fig.savefig('track_skill_curves.png', dpi=300, bbox_inches='tight')
+    plt.close(fig)
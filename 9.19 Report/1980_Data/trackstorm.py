@@ -1,14 +1,16 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.cm as cm
 import numpy as np
 import cartopy.crs as ccrs
 import cartopy.feature as cfeature
+import os
+import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from stormtools.trackstore import load_tracks
 
-df = pd.read_csv('convert_dataset.dat', sep='\s+', engine='python')
-df['dates'] = pd.to_datetime(df['dates'], errors='coerce')
-df['fcst_ini_date'] = pd.to_datetime(df['fcst_ini_date'], errors='coerce')
+
+df = load_tracks('convert_dataset.dat')
 
 
 if df['fcst_ini_date'].isnull().any():
@@ -16,7 +18,7 @@ if df['fcst_ini_date'].isnull().any():
     df = df.dropna(subset=['fcst_ini_date'])
 
 
-df['lons'] = df['lons'].apply(lambda x: x if x <= 180 else x - 360)
+df['lons'] = np.where(df['lons'] <= 180, df['lons'], df['lons'] - 360)
 # get the tracks of storms
 unique_storms = df['fcst_ini_date'].unique()
 
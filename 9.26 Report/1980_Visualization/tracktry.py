@@ -1,18 +1,18 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.cm as cm
 import matplotlib.colors as mcolors
 import cartopy.crs as ccrs
 import cartopy.feature as cfeature
+import numpy as np
+import os
+import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from stormtools.trackstore import load_tracks
 
-column_names = ['date', 'time', 'lats', 'lons', 'vs', 'pa', 'fcst_date', 'fcst_time', 'lead_time_hours']
 
-df = pd.read_csv('convert_dataset.dat', delim_whitespace=True, header=None, names=column_names, skiprows=1)
-df['dates'] = pd.to_datetime(df['date'] + ' ' + df['time'])
-df['fcst_ini_date'] = pd.to_datetime(df['fcst_date'] + ' ' + df['fcst_time'])
-df = df.drop(columns=['date', 'time', 'fcst_date', 'fcst_time'])
-df['lons'] = df['lons'].apply(lambda x: x if x <= 180 else x - 360)
+df = load_tracks('convert_dataset.dat')
+df['lons'] = np.where(df['lons'] <= 180, df['lons'], df['lons'] - 360)
 df_filtered = df[(df['lons'] >= -180) & (df['lons'] <= 180) & (df['lats'] >= -90) & (df['lats'] <= 90)]
 
 unique_storms = df_filtered['fcst_ini_date'].unique()
@@ -1,8 +1,22 @@
 import netCDF4 as nc
 import numpy as np
+import matplotlib
+
+# Headless: every figure is saved, nothing opens a window
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import cartopy.crs as ccrs
 import cartopy.feature as cfeature
+from matplotlib.lines import Line2D
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from stormtools.categories import KNOT_CATEGORIES, categorize, segments_by_category
+from stormtools.climatology import count_storm_months
+from stormtools.ibtracs import char_strings, decode_iso_time
+from stormtools.trackgeom import track_segments
+from stormtools.trackplot import add_segments_by_color
 
 
 
@@ -19,16 +33,12 @@ season_mask = (season == 2022)
 max_wind_mask = np.nanmax(wind, axis=1) >= 34
 combined_mask = season_mask & max_wind_mask
 
-filtered_lon = lon[combined_mask, :]
-filtered_lat = lat[combined_mask, :]
-filtered_wind = wind[combined_mask, :]
-
-categories = [(34, 63, 'Tropical Storm', 'cyan'),
-              (64, 82, 'Category 1', 'lightgreen'),
-              (83, 95, 'Category 2', 'yellow'),
-              (96, 112, 'Category 3', 'orange'),
-              (113, 136, 'Category 4', 'red'),
-              (137, np.inf, 'Category 5', 'purple')]
+# All valid points of the selected storms, storm after storm in time order
+filtered_lon = np.ma.filled(lon[combined_mask, :].astype(np.float64), np.nan)
+filtered_lat = np.ma.filled(lat[combined_mask, :].astype(np.float64), np.nan)
+filtered_wind = np.ma.filled(wind[combined_mask, :].astype(np.float64), np.nan)
+valid_points = np.isfinite(filtered_lon) & np.isfinite(filtered_lat) & np.isfinite(filtered_wind)
+storm_index = np.nonzero(valid_points)[0]
 
 fig = plt.figure(figsize=(10, 6))
 ax = fig.add_subplot(1, 1, 1, projection=ccrs.PlateCarree())
@@ -41,27 +51,22 @@ ax.add_feature(cfeature.STATES, linestyle='--')
 ax.add_feature(cfeature.LAND, color='lightgray')
 ax.add_feature(cfeature.OCEAN, color='lightblue')
 
-for idx in range(len(filtered_lon)):
-    storm_lon = filtered_lon[idx, :]
-    storm_lat = filtered_lat[idx, :]
-    storm_wind = filtered_wind[idx, :]  
+# This map draws Category 1 in lightgreen, unlike the shared knot scale
+MAP_COLORS = ['cyan', 'lightgreen', 'yellow', 'orange', 'red', 'purple']
 
-    valid_points = np.isfinite(storm_lon) & np.isfinite(storm_lat) & np.isfinite(storm_wind)
-    storm_lon = storm_lon[valid_points]
-    storm_lat = storm_lat[valid_points]
-    storm_wind = storm_wind[valid_points]
-    for category in categories:
-        min_wind, max_wind, label, color = category
-        category_mask = (storm_wind >= min_wind) & (storm_wind <= max_wind)
-        ax.plot(storm_lon[category_mask], storm_lat[category_mask], color=color, lw=1, transform=ccrs.PlateCarree(), label=label)
+# Every segment takes the category of its first point (winds below 34 knots
+# have none and are not drawn); one collection per category
+segments, index = track_segments(filtered_lon[valid_points], filtered_lat[valid_points], storm_index)
+codes = categorize(filtered_wind[valid_points], 'knots')[index]
+add_segments_by_color(ax, segments_by_category(segments, codes, 'knots', MAP_COLORS), linewidth=1)
 
-
-handles, labels = ax.get_legend_handles_labels()
-by_label = dict(zip(labels, handles))  
-ax.legend(by_label.values(), by_label.keys(), loc='upper left', title="Wind Categories (knots)")
+handles = [Line2D([0], [0], color=color, lw=1, label=label)
+           for (label, _, _), color in zip(KNOT_CATEGORIES, MAP_COLORS)]
+ax.legend(handles=handles, loc='upper left', title="Wind Categories (knots)")
 
 plt.title('USA Storm Tracks for 2022 by Wind Speed Categories')
-plt.show()
+plt.savefig('usa_storm_tracks_2022.png', dpi=300, bbox_inches='tight')
+plt.close()
 
 
 
@@ -69,47 +74,15 @@ plt.show()
 
 
 #Number of Unique Storms per Month in 2022 (WMO_WIND >= 34)
-iso_time = ds.variables['iso_time'][:]  
+# Every iso_time string of the file, decoded once for both charts
+iso_time = decode_iso_time(ds.variables['iso_time'][:])
 wmo_wind = ds.variables['wmo_wind'][:]  
-sid = ds.variables['sid'][:]  
-
-def safe_decode(value):
-    return ''.join([s.decode('utf-8') for s in value]).strip()
-
-storm_data = []
-
-for i in range(iso_time.shape[0]):  
-    storm_times = iso_time[i, :, :]  
-    storm_wind = wmo_wind[i, :]  
-
-    if np.max(storm_wind) >= 34:
-        storm_times_filled = storm_times.filled('')
-
-        storm_times_decoded = []
-        for t in storm_times_filled:
-            try:
-                decoded_time = ''.join([char.decode('utf-8') for char in t if char != ''])
-                storm_times_decoded.append(decoded_time)
-            except Exception:
-                continue  
+# Storms whose maximum WMO wind reaches 34 knots
+strong_storms = np.ma.filled(np.ma.max(wmo_wind, axis=1) >= 34, False)
 
-        storm_times_dt = pd.to_datetime(storm_times_decoded, errors='coerce', format='%Y-%m-%d %H:%M:%S')
-
-        valid_times_2022 = storm_times_dt[(storm_times_dt.year == 2022) & (~storm_times_dt.isna())]
-
-        storm_id_decoded = safe_decode(sid[i])
-
-        for time in valid_times_2022:
-            storm_data.append({'storm_id': storm_id_decoded, 'date': time})
-
-df = pd.DataFrame(storm_data)
-
-df['year'] = df['date'].dt.year
-df['month'] = df['date'].dt.month
-
-df_unique_storms = df.drop_duplicates(subset=['storm_id', 'month'])
-
-unique_storms_per_month = df_unique_storms.groupby('month').size()
+# Distinct (storm, month) pairs of 2022 counted in one pass
+monthly = count_storm_months(iso_time, strong_storms, year=2022)
+unique_storms_per_month = monthly.groupby('month')['storms'].sum()
 
 
 plt.figure(figsize=(10, 6))
@@ -119,54 +92,27 @@ plt.xlabel('Month')
 plt.ylabel('Number of Unique Storms')
 plt.xticks(np.arange(1, 13, 1))
 plt.yticks(np.arange(0, unique_storms_per_month.max() + 1, 1))
-plt.show()
+plt.savefig('unique_storms_per_month_2022.png', dpi=300, bbox_inches='tight')
+plt.close()
 
 
 
 
 #Number of Unique Storms per Month per Basin in 2022 (Max Wind Speed ≥ 34)
-basin = ds.variables['basin'][:]  
-storm_data = []
-
-for i in range(iso_time.shape[0]):
-    storm_times = iso_time[i, :, :]
-    storm_basin = basin[i, 0]  
-    storm_winds = wmo_wind[i, :]  
-
-    if np.max(storm_winds) >= 34:
-        storm_times_filled = storm_times.filled('')
-        storm_times_decoded = []
-        for t in storm_times_filled:
-            try:
-                decoded_time = ''.join([char.decode('utf-8') for char in t if char != ''])
-                storm_times_decoded.append(decoded_time)
-            except Exception:
-                continue  
-        storm_times_dt = pd.to_datetime(storm_times_decoded, errors='coerce', format='%Y-%m-%d %H:%M:%S')
-        valid_times_2022 = storm_times_dt[(storm_times_dt.year == 2022) & (~storm_times_dt.isna())]
-        storm_id_decoded = safe_decode(sid[i])
-        storm_basin_decoded = safe_decode(storm_basin)
-        for time in valid_times_2022:
-            storm_data.append({'storm_id': storm_id_decoded, 'basin': storm_basin_decoded, 'date': time})
-
-df = pd.DataFrame(storm_data)
-
-df['year'] = df['date'].dt.year
-df['month'] = df['date'].dt.month
-
-df_unique_storms = df.drop_duplicates(subset=['storm_id', 'basin', 'month'])
-
-unique_storms_per_basin_month = df_unique_storms.groupby(['basin', 'month'])['storm_id'].nunique()
-
-result_df = unique_storms_per_basin_month.reset_index()
+# Basin of every storm at its first point
+basin = char_strings(ds.variables['basin'][:, 0])
+by_basin = count_storm_months(iso_time, strong_storms, basins=basin, year=2022)
+
+result_df = by_basin[['basin', 'month', 'storms']]
 print(result_df)
 
-result_df.pivot(index='month', columns='basin', values='storm_id').plot(kind='bar', stacked=True, figsize=(10, 6))
+result_df.pivot(index='month', columns='basin', values='storms').plot(kind='bar', stacked=True, figsize=(10, 6))
 
 plt.title('Number of Unique Storms per Month per Basin in 2022 (Max Wind Speed ≥ 34)')
 plt.xlabel('Month')
 plt.ylabel('Number of Unique Storms')
 plt.xticks(rotation=0)  
-plt.show()
+plt.savefig('unique_storms_per_month_basin_2022.png', dpi=300, bbox_inches='tight')
+plt.close()
 
 
@@ -1,29 +1,56 @@
 import netCDF4 as nc
 import matplotlib.pyplot as plt
 import numpy as np
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 
 file_path = r'C:\Users\10575\Desktop\TE_ready_MERRA2_198001.nc'
-dataset = nc.Dataset(file_path)
 
+MAX_MOVIE_WORKERS = 4
+
+
+def plot_days(file_path, start_day=0, end_day=7):
+    dataset = nc.Dataset(file_path)
+
+    slp = dataset.variables['SLP'][:]
+    lat = dataset.variables['lat'][:]
+    lon = dataset.variables['lon'][:]
+    time = dataset.variables['time'][:]
+
+    fig, axes = plt.subplots(nrows=3, ncols=3, figsize=(15, 10), constrained_layout=True)
+    lat_mid = lat.shape[0] // 2
+    lon_mid = lon.shape[0] // 2
+
+    for i in range(start_day, end_day):
+        ax = axes.flatten()[i]
+        cont = ax.contourf(lon, lat, slp[i, :, :], cmap='coolwarm')
+        ax.set_title(f"Day {i + 1}: Sea Level Pressure")
+        ax.set_xlabel('Longitude')
+        ax.set_ylabel('Latitude')
+    fig.colorbar(cont, ax=axes[:, -1], orientation='vertical', fraction=0.05, pad=0.05)
 
-slp = dataset.variables['SLP'][:]
-lat = dataset.variables['lat'][:]
-lon = dataset.variables['lon'][:]
-time = dataset.variables['time'][:]
+    plt.show()
 
 
-start_day = 0
-end_day = 7
-fig, axes = plt.subplots(nrows=3, ncols=3, figsize=(15, 10), constrained_layout=True)
-lat_mid = lat.shape[0] // 2
-lon_mid = lon.shape[0] // 2
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Daily sea level pressure panels, or the whole month as a movie")
+    parser.add_argument('--movie', type=str, default=None,
+                        help='Write the whole month to this .mp4 (needs ffmpeg) or .gif file instead of '
+                             'showing the panels')
+    parser.add_argument('--workers', type=int, default=2,
+                        help=f'Processes rendering movie frames in parallel (at most {MAX_MOVIE_WORKERS})')
+    args = parser.parse_args()
 
-for i in range(start_day, end_day):
-    ax = axes.flatten()[i]
-    cont = ax.contourf(lon, lat, slp[i, :, :], cmap='coolwarm')
-    ax.set_title(f"Day {i + 1}: Sea Level Pressure")
-    ax.set_xlabel('Longitude')
-    ax.set_ylabel('Latitude')
-fig.colorbar(cont, ax=axes[:, -1], orientation='vertical', fraction=0.05, pad=0.05)
+    if args.movie is None:
+        plot_days(file_path)
+    else:
+        # Headless: frames are streamed to the movie file, nothing is shown
+        from stormtools.animate import write_field_animation_parallel
 
-plt.show()
+        workers = max(1, min(args.workers, MAX_MOVIE_WORKERS, os.cpu_count() or 1))
+        n_frames = write_field_animation_parallel(file_path, args.movie, variable='SLP', fps=12, scale=0.01,
+                                                  workers=workers)
+        print(f"Animation saved as {args.movie} ({n_frames} frames)")
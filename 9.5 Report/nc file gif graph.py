@@ -1,34 +1,22 @@
-import netCDF4 as nc
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
-file_path = r'C:\Users\10575\Desktop\TE_ready_MERRA2_198001.nc'
-dataset = nc.Dataset(file_path)
-slp = dataset.variables['SLP'][:]
-lat = dataset.variables['lat'][:]
-lon = dataset.variables['lon'][:]
-time = dataset.variables['time'][:]
-fig, ax = plt.subplots(figsize=(10, 6))
-
+import os
+import sys
 
-lat_mid = lat.shape[0] // 2
-lon_mid = lon.shape[0] // 2
-contour = ax.contourf(lon, lat, slp[0, :, :], cmap='coolwarm')
-ax.set_xlabel('Longitude')
-ax.set_ylabel('Latitude')
-ax.set_title('Sea Level Pressure')
-cbar = fig.colorbar(contour)
-cbar.set_label('Sea Level Pressure (hPa)')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from stormtools.animate import write_field_animation
 
+file_path = r'C:\Users\10575\Desktop\TE_ready_MERRA2_198001.nc'
 
-def update(frame):
-    ax.clear()
-    contour = ax.contourf(lon, lat, slp[frame, :, :], cmap='coolwarm')
-    ax.set_title(f"Day {frame + 1}: Sea Level Pressure")
-    ax.set_xlabel('Longitude')
-    ax.set_ylabel('Latitude')
-    return contour
-
-# To create an animation, interval is the time interval between each frame (in milliseconds)
-ani = animation.FuncAnimation(fig, update, frames=7, interval=500, repeat=True)
-ani.save('sea_level_pressure_animation.gif', writer='imagemagick')
-plt.show()
+# One SLP slice is read per frame and drawn into the same image, so longer
+# runs only need a larger stop; written with ffmpeg when it is installed
+# (use an .mp4 output for long runs), else with pillow
+n_frames = write_field_animation(
+    file_path, 'sea_level_pressure_animation.gif',
+    variable='SLP',
+    start=0, stop=7,
+    # The time interval between each frame was 500 milliseconds
+    fps=2,
+    scale=0.01,  # Pa -> hPa
+    title='Sea Level Pressure',
+    label='Sea Level Pressure (hPa)',
+)
+print(f"Animation saved as sea_level_pressure_animation.gif ({n_frames} frames)")
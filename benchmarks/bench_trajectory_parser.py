@@ -0,0 +1,171 @@
+"""
+Benchmark the bulk StitchNodes trajectory parser against the original
+line-by-line read_format_ on a synthetic trajectory file.
+
+Usage:
+    python benchmarks/bench_trajectory_parser.py --points 5000000
+"""
+import argparse
+import datetime
+import os
+import re
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from stormtools.trajectory import format_time_columns, read_format_
+
+
+def write_synthetic_trajectories(path, n_points, seed=0):
+    """
+    Write a StitchNodes-style file (--in_fmt "lon,lat,slp,wind,PHIS") with
+    roughly n_points 6-hourly points spread over storms of 10-60 points.
+    """
+    rng = np.random.default_rng(seed)
+    base = np.datetime64('2020-01-01T00', 'h')
+    written = 0
+    with open(path, 'w') as f:
+        while written < n_points:
+            m = int(rng.integers(10, 61))
+            start = base + np.timedelta64(int(rng.integers(0, 366 * 4)) * 6, 'h')
+            times = (start + np.arange(m) * np.timedelta64(6, 'h')).astype(datetime.datetime)
+            lon = (rng.uniform(0, 360) + np.cumsum(rng.normal(-1.0, 0.5, m))) % 360
+            lat = np.clip(rng.uniform(-40, 40) + np.cumsum(rng.normal(0.3, 0.3, m)), -89, 89)
+            slp = rng.normal(100000.0, 500.0, m)
+            wind = rng.uniform(10.0, 40.0, m)
+            phis = rng.uniform(-10.0, 100.0, m)
+            t0 = times[0]
+            lines = [f"start\t{m}\t{t0.year}\t{t0.month}\t{t0.day}\t{t0.hour}\n"]
+            for k in range(m):
+                t = times[k]
+                lines.append(
+                    f"\t{int(lon[k] * 4)}\t{int((lat[k] + 90) * 4)}\t{lon[k]:.6f}\t{lat[k]:.6f}"
+                    f"\t{slp[k]:.6e}\t{wind[k]:.6e}\t{phis[k]:.6e}\t{t.year}\t{t.month}\t{t.day}\t{t.hour}\n"
+                )
+            f.write(''.join(lines))
+            written += m
+    return written
+
+
+def legacy_read_format_(filename):
+    """The per-line reader that 12.5 Report/label_data.py used before the bulk parser."""
+    with open(filename, 'r') as f:
+        lines = f.readlines()
+    line_count = 0
+    storm_id = 1
+
+    data_dict = {
+        'storm_id': [],
+        'dates': [],
+        'lats': [],
+        'lons': [],
+        'wind_speed': [],
+        'pa': [],
+        'storm_start_time': [],
+        'time_since_start_hours': []
+    }
+
+    while line_count < len(lines):
+        line_zero = lines[line_count].strip()
+        split_line = re.split(r'\s+', line_zero)
+
+        if len(split_line) == 0 or split_line[0] != 'start':
+            line_count += 1
+            continue
+
+        try:
+            M = int(split_line[1])
+            storm_start_time = datetime.datetime(int(split_line[2]), int(split_line[3]),
+                                                 int(split_line[4]), int(split_line[5]))
+            line_count += 1
+
+            for _ in range(M):
+                if line_count >= len(lines):
+                    break
+
+                split_data = re.split(r'\s+', lines[line_count].strip())
+                if len(split_data) < 11:
+                    line_count += 1
+                    continue
+
+                try:
+                    lon = float(split_data[2])
+                    lat = float(split_data[3])
+                    pressure = float(split_data[4])
+                    V_speed = float(split_data[5])
+                    valid_date = datetime.datetime(int(split_data[7]), int(split_data[8]),
+                                                   int(split_data[9]), int(split_data[10]))
+                    time_since_start = int((valid_date - storm_start_time).total_seconds() / 3600)
+                except Exception as e:
+                    print(f"Error parsing line {line_count} in {filename}: {e}")
+                    line_count += 1
+                    continue
+
+                data_dict['storm_id'].append(storm_id)
+                data_dict['dates'].append(valid_date.strftime('%Y-%m-%d %H:%M:%S'))
+                data_dict['lats'].append(lat)
+                data_dict['lons'].append(lon)
+                data_dict['wind_speed'].append(V_speed)
+                data_dict['pa'].append(pressure)
+                data_dict['storm_start_time'].append(storm_start_time.strftime('%Y-%m-%d %H:%M:%S'))
+                data_dict['time_since_start_hours'].append(time_since_start)
+
+                line_count += 1
+
+            storm_id += 1
+
+        except Exception as e:
+            print(f"Error processing line {line_count} in {filename}: {e}")
+            line_count += 1
+            continue
+
+    for key, value in data_dict.items():
+        data_dict[key] = [item.item() if isinstance(item, np.ndarray) else item for item in value]
+
+    df = pd.DataFrame(data_dict)
+    df = df.reset_index(drop=True)
+    df['storm_start_time'] = df['storm_start_time'].astype(str)
+    return df
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the StitchNodes trajectory parser")
+    parser.add_argument('--points', type=int, default=5_000_000, help='Number of synthetic track points')
+    parser.add_argument('--file', type=str, default=None,
+                        help='Existing trajectory file to use instead of a synthetic one')
+    parser.add_argument('--skip-legacy', action='store_true', help='Only time the bulk parser')
+    args = parser.parse_args()
+
+    tmp_dir = None
+    if args.file is None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(tmp_dir.name, 'synthetic_trajectories.dat')
+        n, t_write = timed(write_synthetic_trajectories, path, args.points)
+        print(f"Wrote {n} points ({os.path.getsize(path) / 1e6:.1f} MB) in {t_write:.1f} s")
+    else:
+        path = args.file
+
+    df_fast, t_fast = timed(read_format_, path)
+    print(f"bulk read_format_:   {t_fast:8.2f} s  ({len(df_fast)} points)")
+
+    if not args.skip_legacy:
+        df_legacy, t_legacy = timed(legacy_read_format_, path)
+        print(f"legacy read_format_: {t_legacy:8.2f} s  ({len(df_legacy)} points)")
+        # The bulk reader keeps datetime64 times and float32/int32 point fields;
+        # compare the times as text and the legacy numbers at the point precision
+        numeric = {name: df_fast[name].dtype for name in df_fast.columns if df_fast[name].dtype.kind in 'fi'}
+        pd.testing.assert_frame_equal(format_time_columns(df_fast), df_legacy.astype(numeric), check_exact=True)
+        print(f"Outputs identical, speedup {t_legacy / t_fast:.1f}x")
+
+    if tmp_dir is not None:
+        tmp_dir.cleanup()
@@ -0,0 +1,56 @@
+"""
+Check that a track density raster lines up with its track on maps with
+different central longitudes, for both the rolled global grid and the
+resampled path of add_track_density.
+
+Usage:
+    python benchmarks/check_track_density.py
+"""
+import os
+import sys
+
+import cartopy.crs as ccrs
+import numpy as np
+from matplotlib.figure import Figure
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from stormtools.trackgeom import track_density, track_segments
+from stormtools.trackplot import add_track_density
+
+
+def drawn_extent(image):
+    """
+    Map x range covered by the non-empty cells of a drawn density image.
+    """
+    x0, x1, _, _ = image.get_extent()
+    data = np.ma.masked_invalid(image.get_array())
+    occupied = np.flatnonzero(np.ma.getmaskarray(data).sum(axis=0) < data.shape[0])
+    width = (x1 - x0) / data.shape[1]
+    return x0 + occupied.min() * width, x0 + (occupied.max() + 1) * width
+
+
+def check(central_lon, resolution, lons, lats):
+    segments, _ = track_segments(lons, lats, np.zeros(len(lons)))
+    density = track_density(segments, resolution=resolution)
+    fig = Figure()
+    ax = fig.add_subplot(1, 1, 1, projection=ccrs.PlateCarree(central_longitude=central_lon))
+    ax.set_global()
+    image = add_track_density(ax, density)
+
+    track_x = (np.asarray(lons) - central_lon + 180) % 360 - 180
+    drawn = drawn_extent(image)
+    ok = abs(drawn[0] - track_x.min()) <= 2 * resolution and abs(drawn[1] - track_x.max()) <= 2 * resolution
+    print(f"central longitude {central_lon:6.1f}, {resolution} degree cells: track x "
+          f"[{track_x.min():7.1f}, {track_x.max():7.1f}], density x [{drawn[0]:7.1f}, {drawn[1]:7.1f}] "
+          f"{'ok' if ok else 'MISALIGNED'}")
+    return ok
+
+
+if __name__ == "__main__":
+    # A track from 120W to 60W along 20N, in the -180..180 convention
+    lons = np.linspace(-120, -60, 61)
+    lats = np.full(len(lons), 20.0)
+    results = [check(central_lon, resolution, lons, lats)
+               for central_lon in (0, 180, 150)
+               for resolution in (1.0, 0.7)]
+    sys.exit(0 if all(results) else 1)
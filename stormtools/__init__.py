@@ -0,0 +1,9 @@
+"""
+Shared helpers for the storm tracking reports.
+
+The dated report folders keep their own scripts; anything that more than one
+of them needs (reading TempestExtremes output, plotting tracks, IBTrACS
+handling) lives here so that a fix or speedup reaches every pipeline.
+Scripts add the repository root to ``sys.path`` and import the submodules
+directly, e.g. ``from stormtools.trajectory import read_format_``.
+"""
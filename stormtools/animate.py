@@ -0,0 +1,348 @@
+"""
+Streaming animations of gridded netCDF fields (SLP, winds, ...).
+
+The 9.5 report animated a field by loading the whole variable and drawing a
+new contourf for every frame. Here every frame reads one time slice from the
+netCDF file, updates the data of a single imshow artist in place and is
+piped straight to the movie writer, so memory stays at one slice and one
+frame however many time steps are animated.
+
+Frames are independent, so long animations can also be rendered by a
+process pool: every worker opens the file itself and renders a run of
+consecutive time steps to PNG bytes with the shared colour scale, and the
+frames are handed to the movie encoder in time order as the runs complete.
+
+Run with
+
+    python -m stormtools.animate MERRA2_198001.nc slp_198001.mp4 --variable SLP --scale 0.01 --fps 12 --workers 8
+"""
+import io
+import subprocess
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+import netCDF4 as nc
+import numpy as np
+from matplotlib import animation
+from matplotlib.figure import Figure
+
+FRAMES_PER_TASK = 24  # consecutive time steps rendered by one pool task
+
+
+def grid_extent(lon, lat):
+    """
+    imshow extent and origin of a regular lon/lat grid given by its cell
+    centres; the extent reaches half a cell beyond the outer centres.
+    """
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    dlon = (lon[-1] - lon[0]) / max(1, len(lon) - 1)
+    dlat = abs(lat[-1] - lat[0]) / max(1, len(lat) - 1)
+    extent = (lon[0] - dlon / 2, lon[-1] + dlon / 2, lat.min() - dlat / 2, lat.max() + dlat / 2)
+    return extent, 'lower' if lat[-1] >= lat[0] else 'upper'
+
+
+def frame_indices(n_times, start=0, stop=None, step=1):
+    """
+    Time indices of the frames, as for range(start, stop, step) clipped to
+    the n_times steps of the file.
+    """
+    return range(*slice(start, stop, step).indices(n_times))
+
+
+def read_frame(variable, index, scale=1.0):
+    """
+    One time slice of a (time, lat, lon) variable as a float array with NaN
+    where the file has fill values.
+    """
+    field = np.ma.filled(np.ma.asarray(variable[index], dtype=np.float64), np.nan)
+    return field * scale if scale != 1.0 else field
+
+
+def field_range(variable, frames, scale=1.0):
+    """
+    (vmin, vmax) of a variable over the given time indices, read one slice
+    at a time, so all frames share one colour scale.
+    """
+    vmin, vmax = np.inf, -np.inf
+    for index in frames:
+        field = read_frame(variable, index, scale)
+        if np.isfinite(field).any():
+            vmin = min(vmin, np.nanmin(field))
+            vmax = max(vmax, np.nanmax(field))
+    if vmin > vmax:
+        raise ValueError("The selected frames hold no valid values")
+    return float(vmin), float(vmax)
+
+
+def frame_labels(time_variable, frames):
+    """
+    Label of every frame: the date of the time step when the time variable
+    has CF units, else the 1-based step number.
+    """
+    units = getattr(time_variable, 'units', None)
+    if units is None:
+        return [f"Step {index + 1}" for index in frames]
+    values = time_variable[list(frames)] if len(frames) else []
+    dates = nc.num2date(values, units, getattr(time_variable, 'calendar', 'standard'))
+    return [date.strftime('%Y-%m-%d %H:%M') for date in np.atleast_1d(dates)]
+
+
+def field_figure(lon, lat, first, vmin, vmax, cmap='coolwarm', label=None, figsize=(10, 6)):
+    """
+    Figure showing one frame of a field, to be updated in place.
+
+    Returns (fig, image, title): the bare Figure (no pyplot state, so nothing
+    is ever shown), the AxesImage whose data is replaced for every frame and
+    the axes title Text.
+    """
+    extent, origin = grid_extent(lon, lat)
+    fig = Figure(figsize=figsize)
+    ax = fig.add_subplot()
+    image = ax.imshow(first, origin=origin, extent=extent, cmap=cmap, vmin=vmin, vmax=vmax,
+                      interpolation='nearest', aspect='auto')
+    ax.set_xlabel('Longitude')
+    ax.set_ylabel('Latitude')
+    cbar = fig.colorbar(image, ax=ax)
+    if label:
+        cbar.set_label(label)
+    return fig, image, ax.set_title('')
+
+
+def movie_writer(output, fps, writer=None):
+    """
+    Movie writer for output: ffmpeg when it is installed (MP4 or GIF, frames
+    are piped to it as they are drawn), else pillow for a GIF. The pillow
+    writer keeps the frames until the GIF is written, so install ffmpeg for
+    long animations.
+    """
+    if writer is None:
+        writer = 'ffmpeg' if animation.writers.is_available('ffmpeg') else 'pillow'
+    if writer == 'pillow' and not output.lower().endswith('.gif'):
+        raise ValueError(f"The pillow writer only writes GIF files, install ffmpeg to write {output}")
+    return animation.writers[writer](fps=fps)
+
+
+def frame_runs(frames, run_length=FRAMES_PER_TASK):
+    """
+    Split the frame indices into runs of at most run_length consecutive
+    frames, in order.
+    """
+    return [frames[i:i + run_length] for i in range(0, len(frames), run_length)]
+
+
+def _run_range(task):
+    """
+    Pool task: (vmin, vmax) of a run of frames, or None when it holds no
+    valid values.
+    """
+    path, variable, frames, scale = task
+    with nc.Dataset(path) as dataset:
+        try:
+            return field_range(dataset.variables[variable], frames, scale)
+        except ValueError:
+            return None
+
+
+def _render_run(task):
+    """
+    Pool task: PNG bytes of every frame of a run, drawn with the shared
+    colour scale.
+    """
+    path, variable, frames, labels, scale, vmin, vmax, cmap, title, label, dpi = task
+    with nc.Dataset(path) as dataset:
+        data = dataset.variables[variable]
+        fig, image, title_text = field_figure(dataset.variables['lon'][:], dataset.variables['lat'][:],
+                                              read_frame(data, frames[0], scale), vmin, vmax, cmap, label)
+        pngs = []
+        for index, frame_label in zip(frames, labels):
+            image.set_data(read_frame(data, index, scale))
+            title_text.set_text(f"{frame_label}: {title}")
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format='png', dpi=dpi)
+            pngs.append(buffer.getvalue())
+    return pngs
+
+
+def _ordered_results(executor, function, tasks, window):
+    """
+    Results of function over tasks in task order, with at most window tasks
+    submitted ahead of the one being consumed, so finished runs do not pile
+    up in memory while an earlier one is still rendering.
+    """
+    tasks = iter(tasks)
+    pending = deque()
+    for task in tasks:
+        pending.append(executor.submit(function, task))
+        if len(pending) >= window:
+            break
+    while pending:
+        result = pending.popleft().result()
+        for task in tasks:
+            pending.append(executor.submit(function, task))
+            break
+        yield result
+
+
+def write_png_movie(pngs, output, fps):
+    """
+    Encode an iterable of PNG frames, in order, into a movie file: piped to
+    ffmpeg when it is installed, else collected by pillow into a GIF.
+
+    Returns the number of frames written.
+    """
+    n_frames = 0
+    if animation.writers.is_available('ffmpeg'):
+        command = [matplotlib.rcParams['animation.ffmpeg_path'], '-y', '-loglevel', 'error',
+                   '-f', 'image2pipe', '-framerate', str(fps), '-c:v', 'png', '-i', '-']
+        if not output.lower().endswith('.gif'):
+            # H.264 needs even frame sizes
+            command += ['-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2']
+        process = subprocess.Popen(command + [output], stdin=subprocess.PIPE)
+        try:
+            for png in pngs:
+                process.stdin.write(png)
+                n_frames += 1
+        finally:
+            process.stdin.close()
+            if process.wait() != 0:
+                raise RuntimeError(f"ffmpeg failed to write {output}")
+        return n_frames
+
+    if not output.lower().endswith('.gif'):
+        raise ValueError(f"Without ffmpeg only GIF files can be written, not {output}")
+    from PIL import Image
+
+    # Palette images take a quarter of the memory of the RGBA frames
+    frames = [Image.open(io.BytesIO(png)).convert('RGB').quantize() for png in pngs]
+    if frames:
+        frames[0].save(output, save_all=True, append_images=frames[1:], duration=1000 / fps, loop=0)
+    return len(frames)
+
+
+def write_field_animation_parallel(path, output, variable='SLP', start=0, stop=None, step=1, fps=2, scale=1.0,
+                                   vmin=None, vmax=None, cmap='coolwarm', title='Sea Level Pressure',
+                                   label='Sea Level Pressure (hPa)', dpi=100, workers=2,
+                                   run_length=FRAMES_PER_TASK):
+    """
+    write_field_animation with the frames rendered by a process pool.
+
+    The colour scale and the frames are computed run by run (run_length
+    consecutive time steps per task) in worker processes that each open the
+    file; the PNG frames are encoded in time order by write_png_movie. The
+    other parameters are those of write_field_animation.
+
+    Returns the number of frames written.
+    """
+    with nc.Dataset(path) as dataset:
+        n_times = dataset.variables[variable].shape[0]
+        frames = frame_indices(n_times, start, stop, step)
+        if len(frames) == 0:
+            raise ValueError(f"No time steps selected from the {n_times} of {path}")
+        labels = frame_labels(dataset.variables['time'], frames)
+    runs = frame_runs(frames, run_length)
+    workers = max(1, min(workers, len(runs)))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        if vmin is None or vmax is None:
+            ranges = [r for r in executor.map(_run_range, [(path, variable, run, scale) for run in runs])
+                      if r is not None]
+            if not ranges:
+                raise ValueError("The selected frames hold no valid values")
+            vmin = min(r[0] for r in ranges) if vmin is None else vmin
+            vmax = max(r[1] for r in ranges) if vmax is None else vmax
+
+        tasks = []
+        first = 0
+        for run in runs:
+            tasks.append((path, variable, run, labels[first:first + len(run)], scale, vmin, vmax, cmap,
+                          title, label, dpi))
+            first += len(run)
+        pngs = (png for run_pngs in _ordered_results(executor, _render_run, tasks, 2 * workers)
+                for png in run_pngs)
+        return write_png_movie(pngs, output, fps)
+
+
+def write_field_animation(path, output, variable='SLP', start=0, stop=None, step=1, fps=2, scale=1.0,
+                          vmin=None, vmax=None, cmap='coolwarm', title='Sea Level Pressure',
+                          label='Sea Level Pressure (hPa)', dpi=100, writer=None):
+    """
+    Animate a (time, lat, lon) variable of a netCDF file, one time slice per
+    frame.
+
+    Parameters:
+    - path: netCDF file with 'lat', 'lon' and 'time' variables.
+    - output: Movie file (.mp4 or .gif).
+    - variable: Name of the animated variable.
+    - start, stop, step: Time indices of the frames, as for range().
+    - fps: Frames per second.
+    - scale: Factor applied to the values (e.g. 0.01 for Pa -> hPa).
+    - vmin, vmax: Colour scale limits; by default the range of the animated
+      frames, found in a first pass over the file.
+    - cmap: Colour map.
+    - title: Frame title, after the frame date.
+    - label: Colour bar label.
+    - dpi: Resolution of the frames.
+    - writer: Name of a matplotlib movie writer (see movie_writer).
+
+    Returns the number of frames written.
+    """
+    with nc.Dataset(path) as dataset:
+        data = dataset.variables[variable]
+        frames = frame_indices(data.shape[0], start, stop, step)
+        if len(frames) == 0:
+            raise ValueError(f"No time steps selected from the {data.shape[0]} of {path}")
+        if vmin is None or vmax is None:
+            low, high = field_range(data, frames, scale)
+            vmin = low if vmin is None else vmin
+            vmax = high if vmax is None else vmax
+        labels = frame_labels(dataset.variables['time'], frames)
+
+        fig, image, title_text = field_figure(dataset.variables['lon'][:], dataset.variables['lat'][:],
+                                              read_frame(data, frames[0], scale), vmin, vmax, cmap, label)
+        movie = movie_writer(output, fps, writer)
+        with movie.saving(fig, output, dpi):
+            for index, frame_label in zip(frames, labels):
+                image.set_data(read_frame(data, index, scale))
+                title_text.set_text(f"{frame_label}: {title}")
+                movie.grab_frame()
+    return len(frames)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Animate a (time, lat, lon) netCDF variable frame by frame")
+    parser.add_argument('path', type=str, help='netCDF file')
+    parser.add_argument('output', type=str, help='Movie file to write (.mp4 or .gif)')
+    parser.add_argument('--variable', type=str, default='SLP', help='Variable to animate')
+    parser.add_argument('--start', type=int, default=0, help='First time index')
+    parser.add_argument('--stop', type=int, default=None, help='Time index to stop before')
+    parser.add_argument('--step', type=int, default=1, help='Time index step between frames')
+    parser.add_argument('--fps', type=float, default=2, help='Frames per second')
+    parser.add_argument('--scale', type=float, default=1.0, help='Factor applied to the values')
+    parser.add_argument('--title', type=str, default='Sea Level Pressure', help='Frame title')
+    parser.add_argument('--label', type=str, default='Sea Level Pressure (hPa)', help='Colour bar label')
+    parser.add_argument('--dpi', type=int, default=100, help='Frame resolution')
+    parser.add_argument('--writer', type=str, default=None, help='Matplotlib movie writer (ffmpeg or pillow)')
+    parser.add_argument('--workers', type=int, default=1, help='Number of processes rendering frames in parallel')
+    args = parser.parse_args(argv)
+
+    start_time = time.perf_counter()
+    if args.workers > 1:
+        n_frames = write_field_animation_parallel(args.path, args.output, args.variable, args.start, args.stop,
+                                                  args.step, args.fps, args.scale, title=args.title,
+                                                  label=args.label, dpi=args.dpi, workers=args.workers)
+    else:
+        n_frames = write_field_animation(args.path, args.output, args.variable, args.start, args.stop, args.step,
+                                         args.fps, args.scale, title=args.title, label=args.label, dpi=args.dpi,
+                                         writer=args.writer)
+    print(f"Animation saved as {args.output} ({n_frames} frames, {time.perf_counter() - start_time:.1f} s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
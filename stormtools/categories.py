@@ -0,0 +1,120 @@
+"""
+Saffir-Simpson categories of wind speeds.
+
+The reports use two scales: IBTrACS maximum sustained winds in knots
+(tropical storm and hurricane categories 1-5) and the m/s classes of the
+TempestExtremes track maps (TD, TS and categories 1-5). categorize finds the
+category of every value of a wind array with one np.digitize call, and
+group_by_category splits points or segments by category with one stable
+sort, so a map draws one collection per category instead of masking the
+data once per storm and category.
+"""
+import numpy as np
+
+# IBTrACS maximum sustained wind in knots: (name, lower bound, colour). Lower
+# bounds are inclusive, as with the integer knot ranges of the legends; slower
+# winds have no category
+KNOT_CATEGORIES = (
+    ('Tropical Storm', 34, 'cyan'),
+    ('Category 1', 64, 'green'),
+    ('Category 2', 83, 'yellow'),
+    ('Category 3', 96, 'orange'),
+    ('Category 4', 113, 'red'),
+    ('Category 5', 137, 'purple'),
+)
+
+# Wind classes in m/s of the 10.17/10.24 Saffir-Simpson maps: (name, upper
+# bound, colour). Upper bounds are inclusive, as with pd.cut(right=True)
+MS_CATEGORIES = (
+    ('TD', 17, 'blue'),
+    ('TS', 32, 'cyan'),
+    ('Category 1', 42, 'green'),
+    ('Category 2', 49, 'yellow'),
+    ('Category 3', 58, 'orange'),
+    ('Category 4', 70, 'red'),
+    ('Category 5', np.inf, 'purple'),
+)
+
+WIND_SCALES = {
+    'knots': KNOT_CATEGORIES,
+    'ms': MS_CATEGORIES,
+}
+
+
+def categorize(wind, units='knots'):
+    """
+    Category code of every wind speed.
+
+    Parameters:
+    - wind: Wind speeds, any shape (array, masked array or Series).
+    - units: 'knots' (KNOT_CATEGORIES) or 'ms' (MS_CATEGORIES).
+
+    Returns an int array of the shape of wind holding the index of the
+    category in its scale, or -1 for missing values and, in knots, winds
+    below tropical storm strength.
+    """
+    if units not in WIND_SCALES:
+        raise ValueError(f"Unknown wind units {units!r}, expected one of {sorted(WIND_SCALES)}")
+    wind = np.ma.filled(np.ma.asarray(wind, dtype=np.float64), np.nan)
+    if units == 'knots':
+        codes = np.digitize(wind, [bound for _, bound, _ in KNOT_CATEGORIES]) - 1
+    else:
+        codes = np.digitize(wind, [bound for _, bound, _ in MS_CATEGORIES[:-1]], right=True)
+    codes[np.isnan(wind)] = -1
+    return codes
+
+
+def category_names(units='knots'):
+    """
+    Names of the categories of a scale, in code order.
+    """
+    return [name for name, _, _ in WIND_SCALES[units]]
+
+
+def category_colors(units='knots'):
+    """
+    Colours of the categories of a scale, in code order.
+    """
+    return [color for _, _, color in WIND_SCALES[units]]
+
+
+def group_by_category(values, codes, n_categories):
+    """
+    Split values by category with one stable sort.
+
+    Parameters:
+    - values: Array (or sequence, used as an object array) with one item per code.
+    - codes: Category code of every item, -1 for none (see categorize).
+    - n_categories: Number of categories of the scale.
+
+    Returns a list of n_categories arrays; item k holds the values of code
+    k in their original order. Values without a category are left out.
+    """
+    codes = np.asarray(codes)
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(n_categories + 1))
+    if not isinstance(values, np.ndarray):
+        items = values
+        values = np.empty(len(items), dtype=object)
+        for i, item in enumerate(items):
+            values[i] = item
+    return [values[order[bounds[k]:bounds[k + 1]]] for k in range(n_categories)]
+
+
+def segments_by_category(segments, codes, units='knots', colors=None):
+    """
+    Segments grouped by category, ready for
+    stormtools.trackplot.add_segments_by_color.
+
+    Parameters:
+    - segments: (n, 2, 2) segment array, e.g. from
+      stormtools.trackgeom.track_segments.
+    - codes: Category code of every segment, e.g. categorize(wind)[index].
+    - units: Scale of the codes.
+    - colors: Colour of every category in code order, for a map with its
+      own palette; None uses the colours of the scale.
+
+    Returns a dict of category colour -> segments, in category order.
+    """
+    groups = group_by_category(segments, codes, len(WIND_SCALES[units]))
+    return dict(zip(colors if colors is not None else category_colors(units), groups))
@@ -0,0 +1,232 @@
+"""
+Storm counts and climatologies of IBTrACS best tracks.
+
+The per-month and per-basin charts of the IBTrACS reports count a storm once
+in every month (and basin) it was active in. Instead of taking the unique
+months of one storm at a time, the counters here build an integer key for
+every (storm, month[, basin]) of all points at once, keep the distinct keys
+with one np.unique and count them per month and basin with np.bincount.
+
+build_climatology summarises every season of an IBTrACS file at once from
+its per-season cache (stormtools.ibtracs): storm counts per season, month
+and basin, the histogram of the categories of the storms' maximum winds and
+their lifetimes. The tables are small CSV files, so charts of any season
+read them instead of the raw netCDF file:
+
+    python -m stormtools.climatology IBTrACS.ALL.v04r01.nc climatology/
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from stormtools.categories import KNOT_CATEGORIES, categorize
+from stormtools.ibtracs import open_ibtracs_cache
+
+CLIMATOLOGY_FILES = {
+    'counts': 'storm_counts.csv',
+    'seasons': 'season_summary.csv',
+}
+
+UNCATEGORIZED = 'No category'  # maximum usa_wind missing or below tropical storm strength
+
+
+def count_point_months(storm, times, basins=None, seasons=None):
+    """
+    Number of distinct storms active in every month (and basin).
+
+    Parameters:
+    - storm: Storm index of every point (non-negative integers).
+    - times: datetime64 time of every point; NaT points are ignored.
+    - basins: Optional basin label of every point (e.g. IBTrACS S2 codes);
+      points with an empty label are ignored.
+    - seasons: Optional season of every point (e.g. the IBTrACS season of
+      its storm); the table is then keyed by 'season' instead of the
+      calendar 'year'.
+
+    Returns a DataFrame with one row per (year or season, month[, basin])
+    holding at least one storm: columns 'year' or 'season', 'month', 'basin'
+    (when basins are given) and 'storms', sorted in that order.
+    """
+    period_name = 'year' if seasons is None else 'season'
+    columns = [period_name, 'month'] + (['basin'] if basins is not None else []) + ['storms']
+    storm = np.asarray(storm, dtype=np.int64)
+    times = np.asarray(times).astype('datetime64[M]')
+    valid = ~np.isnat(times)
+    if basins is not None:
+        basins = np.asarray(basins)
+        valid &= basins != basins.dtype.type()
+    if not valid.any():
+        return pd.DataFrame({name: [] for name in columns})
+
+    storm = storm[valid]
+    month_index = times[valid].astype(np.int64)  # months since 1970-01
+    period = month_index // 12 + 1970 if seasons is None else np.asarray(seasons, dtype=np.int64)[valid]
+    first_period = period.min()
+    cell = (period - first_period) * 12 + month_index % 12
+    names = None
+    if basins is not None:
+        names, basin_code = np.unique(basins[valid], return_inverse=True)
+        cell = cell * len(names) + basin_code.ravel()
+
+    # One key per (cell, storm); the distinct keys count every storm once per cell
+    n_storms = storm.max() + 1
+    keys = np.unique(cell * n_storms + storm)
+    counts = np.bincount(keys // n_storms)
+    occupied = np.flatnonzero(counts)
+
+    result = {}
+    cell = occupied
+    if names is not None:
+        cell, basin_code = np.divmod(occupied, len(names))
+    result[period_name] = cell // 12 + first_period
+    result['month'] = cell % 12 + 1
+    if names is not None:
+        result['basin'] = names[basin_code].astype(str)
+    result['storms'] = counts[occupied]
+    return pd.DataFrame(result, columns=columns)
+
+
+def count_storm_months(times, storm_mask=None, basins=None, year=None):
+    """
+    count_point_months for (storm, date_time) arrays as read from IBTrACS.
+
+    Parameters:
+    - times: (storm, date_time) datetime64 array, e.g. from
+      stormtools.ibtracs.decode_iso_time.
+    - storm_mask: Optional boolean array selecting the storms to count.
+    - basins: Optional basin labels, per point (storm, date_time) or per
+      storm (storm,).
+    - year: Only count points of this calendar year.
+
+    Returns the count table of count_point_months.
+    """
+    times = np.asarray(times)
+    keep = ~np.isnat(times)
+    if storm_mask is not None:
+        keep &= np.asarray(storm_mask, dtype=bool)[:, None]
+    if year is not None:
+        keep &= times.astype('datetime64[Y]').astype(np.int64) + 1970 == year
+    storm, step = np.nonzero(keep)
+    if basins is not None:
+        basins = np.asarray(basins)
+        basins = basins[storm, step] if basins.ndim == 2 else basins[storm]
+    return count_point_months(storm, times[storm, step], basins)
+
+
+def monthly_counts(counts):
+    """
+    Storms per calendar month (1-12) of a count table, months without
+    storms included as 0. Sums over years and basins.
+    """
+    return counts.groupby('month')['storms'].sum().reindex(pd.Index(np.arange(1, 13), name='month'), fill_value=0)
+
+
+def monthly_basin_counts(counts):
+    """
+    Storms per calendar month (rows 1-12) and basin (columns) of a count
+    table with basins. Sums over years.
+    """
+    table = counts.pivot_table(index='month', columns='basin', values='storms', aggfunc='sum', fill_value=0)
+    return table.reindex(pd.Index(np.arange(1, 13), name='month'), fill_value=0)
+
+
+def build_climatology(path, min_wind=34, cache_dir=None):
+    """
+    Climatology tables of every season of an IBTrACS file.
+
+    Parameters:
+    - path: IBTrACS netCDF file or per-season cache (see
+      stormtools.ibtracs.open_ibtracs_cache, which builds the cache on
+      first use).
+    - min_wind: Only storms whose maximum usa_wind exceeds this many knots
+      are counted, as in the 10.3 charts (Max Wind Speed > 34); None counts
+      every storm.
+    - cache_dir: Directory of the IBTrACS caches.
+
+    Returns a dict of DataFrames:
+    - 'counts': storms per season, month and basin (see count_point_months).
+    - 'seasons': one row per season with the number of storms, the number
+      of storms per category of their maximum usa_wind (UNCATEGORIZED for
+      none) and the mean, median and maximum storm lifetime in days.
+    """
+    cache = open_ibtracs_cache(path, cache_dir)
+    points = np.asarray(cache['points'])
+    storms = np.asarray(cache['storms'])
+    offsets = np.asarray(cache['storm_offsets'])
+
+    max_wind = storms['max_usa_wind'].astype(np.float64)
+    selected = max_wind > min_wind if min_wind is not None else np.ones(len(storms), dtype=bool)
+    storm = np.repeat(np.arange(len(storms)), storms['n_points'])
+    keep = selected[storm]
+    counts = count_point_months(storm[keep], points['time'][keep], points['basin'][keep],
+                                seasons=storms['season'][storm[keep]])
+
+    # Lifetime from the first to the last point of every storm
+    lifetime = np.full(len(storms), np.nan)
+    nonempty = storms['n_points'] > 0
+    first_time = points['time'][offsets[:-1][nonempty]]
+    last_time = points['time'][offsets[1:][nonempty] - 1]
+    lifetime[nonempty] = (last_time - first_time) / np.timedelta64(1, 'h') / 24
+
+    names = [UNCATEGORIZED] + [name for name, _, _ in KNOT_CATEGORIES]
+    per_storm = pd.DataFrame({
+        'season': storms['season'][selected].astype(np.int64),
+        'category': pd.Categorical.from_codes(categorize(max_wind[selected], 'knots') + 1, categories=names),
+        'lifetime_days': lifetime[selected],
+    })
+    grouped = per_storm.groupby('season')
+    seasons = pd.DataFrame({
+        'storms': grouped.size(),
+        'lifetime_mean_days': grouped['lifetime_days'].mean(),
+        'lifetime_median_days': grouped['lifetime_days'].median(),
+        'lifetime_max_days': grouped['lifetime_days'].max(),
+    })
+    histogram = pd.crosstab(per_storm['season'], per_storm['category'], dropna=False)
+    seasons = seasons.join(histogram.reindex(columns=names, fill_value=0)).fillna({name: 0 for name in names})
+    seasons[names] = seasons[names].astype(np.int64)
+    return {'counts': counts, 'seasons': seasons.reset_index()}
+
+
+def write_climatology(tables, output_dir):
+    """
+    Write the tables of build_climatology as CSV files (CLIMATOLOGY_FILES)
+    in output_dir.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    for name, filename in CLIMATOLOGY_FILES.items():
+        tables[name].to_csv(os.path.join(output_dir, filename), index=False)
+
+
+def load_climatology(output_dir):
+    """
+    Read the tables written by write_climatology, as a dict of DataFrames.
+    """
+    # 'NA' is the North Atlantic basin, not a missing value
+    return {name: pd.read_csv(os.path.join(output_dir, filename), keep_default_na=False, na_values=[''])
+            for name, filename in CLIMATOLOGY_FILES.items()}
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build per-season IBTrACS climatology tables")
+    parser.add_argument('path', type=str, help='IBTrACS netCDF file')
+    parser.add_argument('output_dir', type=str, help='Directory to write the CSV tables in')
+    parser.add_argument('--min-wind', type=float, default=34,
+                        help='Only count storms whose maximum usa_wind exceeds this many knots (negative: all storms)')
+    parser.add_argument('--cache-dir', type=str, default=None, help='Directory of the IBTrACS caches')
+    args = parser.parse_args(argv)
+
+    start_time = time.perf_counter()
+    tables = build_climatology(args.path, args.min_wind if args.min_wind >= 0 else None, args.cache_dir)
+    write_climatology(tables, args.output_dir)
+    print(f"Climatology of {len(tables['seasons'])} seasons and {int(tables['seasons']['storms'].sum())} storms "
+          f"written to {args.output_dir} ({time.perf_counter() - start_time:.1f} s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
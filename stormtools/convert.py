@@ -0,0 +1,260 @@
+"""
+Batch conversion of StitchNodes trajectory files into track outputs.
+
+Every .dat file is converted independently, so a batch can be spread over a
+process pool; results come back in the order of the input list.
+
+A manifest in the output directory records the size, mtime and hash of every
+converted input next to its output, so reruns only convert new or changed
+files and drop the outputs of deleted inputs.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from stormtools.trackstore import ARCHIVE_SUFFIX, STORE_SUFFIX, write_track_archive, write_track_store
+from stormtools.trajectory import dropped_rows, has_errors, write_trajectory_csv
+
+MANIFEST_NAME = 'conversion_manifest.json'
+HASH_READ_SIZE = 2**20
+
+OUTPUT_SUFFIXES = {
+    'npz': STORE_SUFFIX,
+    'tracks': ARCHIVE_SUFFIX,
+    'csv': '_processed.csv',
+}
+
+
+def output_path_for(data_file_path, output_base_dir, fmt='npz'):
+    """
+    Output path of a .dat file for the given output format.
+    """
+    name_without_ext = os.path.splitext(os.path.basename(data_file_path))[0]
+    # Replace spaces in file name with underscores to avoid issues
+    name_without_ext_safe = name_without_ext.replace(' ', '_')
+    return os.path.join(output_base_dir, name_without_ext_safe + OUTPUT_SUFFIXES[fmt])
+
+
+def file_digest(path):
+    """
+    SHA-256 hex digest of a file, read in blocks.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_READ_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def convert_file(data_file_path, output_base_dir, fmt='npz'):
+    """
+    Convert one .dat file and report the outcome instead of raising.
+
+    Parameters:
+    - data_file_path: Path to the .dat file written by StitchNodes.
+    - output_base_dir: Directory to save the converted file in.
+    - fmt: 'npz' (columnar track store), 'tracks' (memory-mapped archive) or 'csv'.
+
+    Returns a dict with 'input', 'output', 'points', 'seconds' and 'error'
+    (None when the conversion succeeded), the parse error report 'errors'
+    (see stormtools.trajectory.empty_errors), plus the 'size', 'mtime_ns'
+    and 'sha256' of the input as it was before converting.
+    """
+    output_file_path = output_path_for(data_file_path, output_base_dir, fmt)
+    result = {'input': data_file_path, 'output': output_file_path, 'points': 0, 'seconds': 0.0, 'error': None,
+              'errors': None}
+    start = time.perf_counter()
+    try:
+        # Fingerprint first: if the file changes while converting, the next run sees a new mtime
+        stat = os.stat(data_file_path)
+        result['size'] = stat.st_size
+        result['mtime_ns'] = stat.st_mtime_ns
+        result['sha256'] = file_digest(data_file_path)
+        if fmt == 'npz':
+            # Typed columns with native datetime64 times, loaded by stormtools.trackstore
+            result['points'], result['errors'] = write_track_store(data_file_path, output_file_path)
+        elif fmt == 'tracks':
+            # Storm-structured archive: storm k is an O(1) slice, no groupby needed
+            result['points'], result['errors'] = write_track_archive(data_file_path, output_file_path)
+        else:
+            # Convert storm chunks straight to CSV so large files use constant memory
+            result['points'], result['errors'] = write_trajectory_csv(data_file_path, output_file_path)
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def convert_files(file_list, output_base_dir, fmt='npz', workers=1):
+    """
+    Convert a list of .dat files, optionally in parallel.
+
+    Parameters:
+    - file_list: Paths of the .dat files to convert.
+    - output_base_dir: Directory to save the converted files in.
+    - fmt: Output format, see convert_file.
+    - workers: Number of worker processes; 1 converts in this process.
+
+    Returns one convert_file result per input, in the order of file_list.
+    """
+    os.makedirs(output_base_dir, exist_ok=True)
+    workers = max(1, min(workers, len(file_list)))
+    if workers == 1:
+        return [convert_file(path, output_base_dir, fmt) for path in file_list]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map() yields in submission order whatever order the workers finish in
+        return list(executor.map(convert_file, file_list,
+                                 [output_base_dir] * len(file_list), [fmt] * len(file_list)))
+
+
+def load_manifest(output_base_dir):
+    """
+    Manifest entries of an output directory, keyed by absolute input path
+    and then by output format, so the outputs of every format are tracked
+    side by side.
+
+    Each entry holds the 'size', 'mtime_ns' and 'sha256' of the input and
+    the 'output' path and 'format' it was converted to. A missing or
+    unreadable manifest gives no entries, so everything is reconverted.
+    """
+    try:
+        with open(os.path.join(output_base_dir, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+        files = manifest['files']
+        if manifest.get('version', 1) == 1:
+            # Version 1 held a single entry per input
+            return {key: {entry['format']: entry} for key, entry in files.items()}
+        return files
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+
+
+def save_manifest(output_base_dir, entries):
+    """
+    Write the manifest atomically, so an interrupted run leaves the old one.
+    """
+    path = os.path.join(output_base_dir, MANIFEST_NAME)
+    with open(path + '.tmp', 'w') as f:
+        json.dump({'version': 2, 'files': entries}, f, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def _remove_output(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def _is_current(entry, data_file_path, output_file_path, fmt):
+    """
+    Whether a manifest entry still describes the input and its output.
+
+    Size and mtime decide for unchanged files; the hash is only computed when
+    the mtime moved but the size did not (e.g. a file copied again).
+    """
+    if entry is None or entry['format'] != fmt or entry['output'] != output_file_path:
+        return False
+    if not os.path.exists(output_file_path):
+        return False
+    stat = os.stat(data_file_path)
+    if stat.st_size != entry['size']:
+        return False
+    if stat.st_mtime_ns == entry['mtime_ns']:
+        return True
+    if file_digest(data_file_path) != entry['sha256']:
+        return False
+    entry['mtime_ns'] = stat.st_mtime_ns
+    return True
+
+
+def update_files(file_list, output_base_dir, fmt='npz', workers=1, force=False):
+    """
+    Incrementally convert a list of .dat files against the output manifest.
+
+    Parameters:
+    - file_list: Paths of the .dat files to convert.
+    - output_base_dir: Directory holding the converted files and the manifest.
+    - fmt: Output format, see convert_file.
+    - workers: Number of worker processes, see convert_files.
+    - force: Reconvert every file even when the manifest says it is current.
+
+    Returns (results, removed): one result per input in file_list order,
+    with 'skipped' set for files that were already up to date, and the
+    outputs removed because their input no longer exists. Outputs of the
+    other formats are left alone.
+    """
+    # Absolute paths keep manifest entries valid whatever directory a run starts in
+    output_base_dir = os.path.abspath(output_base_dir)
+    os.makedirs(output_base_dir, exist_ok=True)
+    entries = load_manifest(output_base_dir)
+
+    # Drop outputs, of every format, whose input is gone
+    removed = []
+    for key in sorted(entries):
+        if not os.path.exists(key):
+            for entry in entries.pop(key).values():
+                _remove_output(entry['output'])
+                removed.append(entry['output'])
+
+    results = [None] * len(file_list)
+    pending = []
+    for i, path in enumerate(file_list):
+        output_file_path = output_path_for(path, output_base_dir, fmt)
+        entry = entries.get(os.path.abspath(path), {}).get(fmt)
+        if not force and _is_current(entry, path, output_file_path, fmt):
+            results[i] = {'input': path, 'output': output_file_path, 'skipped': True, 'error': None}
+        else:
+            pending.append(i)
+
+    converted = convert_files([file_list[i] for i in pending], output_base_dir, fmt, workers)
+    for i, result in zip(pending, converted):
+        results[i] = result
+        key = os.path.abspath(result['input'])
+        formats = entries.setdefault(key, {})
+        if result['error'] is not None:
+            # Forget failed inputs so the next run retries them
+            formats.pop(fmt, None)
+            if not formats:
+                del entries[key]
+            continue
+        # A stale output of the same format under another name is replaced
+        old = formats.get(fmt)
+        if old is not None and old['output'] != result['output']:
+            _remove_output(old['output'])
+        formats[fmt] = {name: result[name] for name in ('size', 'mtime_ns', 'sha256', 'output')}
+        formats[fmt]['format'] = fmt
+
+    save_manifest(output_base_dir, entries)
+    return results, removed
+
+
+def print_summary(results, removed=()):
+    """
+    Print one line per converted file, in input order, and the totals.
+    """
+    for path in removed:
+        print(f"Removed {path}: its input file no longer exists")
+    skipped = 0
+    for result in results:
+        if result.get('skipped'):
+            skipped += 1
+        elif result['error'] is None:
+            print(f"The file was saved to {result['output']} "
+                  f"({result['points']} points, {result['seconds']:.1f} s)")
+            report = result['errors']
+            if has_errors(report):
+                lines = ', '.join(str(line) for line in report['lines'])
+                print(f"  Dropped {dropped_rows(report)} malformed point rows "
+                      f"({report['short_rows']} short, {report['bad_values']} bad values, "
+                      f"{report['bad_dates']} bad dates), {report['bad_headers']} bad headers and "
+                      f"{report['orphan_rows']} orphan rows; {report['missing_rows']} announced rows "
+                      f"missing. First lines: {lines}")
+        else:
+            print(f"An error occurred while processing file {result['input']}: {result['error']}")
+    failed = sum(result['error'] is not None for result in results)
+    print(f"Converted {len(results) - skipped - failed} of {len(results)} files, "
+          f"{skipped} up to date, {failed} failed.")
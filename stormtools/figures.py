@@ -0,0 +1,323 @@
+"""
+Figure builders for the report track maps.
+
+Each builder draws one complete figure and returns it without saving or
+showing it, so the same code serves the report scripts and the headless
+batch renderer in stormtools.render. Builders take plain keyword arguments
+(paths, time window, colouring, dpi), which is what a figure spec holds.
+"""
+import glob
+import os
+
+import cartopy.crs as ccrs
+import matplotlib.patches as mpatches
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from matplotlib import cm
+from matplotlib import colors as mcolors
+from matplotlib.lines import Line2D
+
+from stormtools.categories import KNOT_CATEGORIES, categorize, group_by_category
+from stormtools.ibtracs import season_tracks
+from stormtools.trackgeom import (sort_tracks, split_at_dateline, split_pieces, storm_offsets, track_density,
+                                  track_segments)
+from stormtools.trackplot import add_basemap, add_track_density, add_track_segments
+from stormtools.trackstore import load_tracks
+
+STORM_COLORS = ['red', 'yellow', 'blue', 'green', 'orange', 'purple', 'cyan', 'magenta', 'brown', 'black']
+
+# Storm start column of label-schema files (and track stores), then of forecast-schema files
+STORM_START_COLUMNS = ('storm_start_time', 'fcst_ini_date')
+
+
+def _in_window(df, start=None, end=None, column='dates'):
+    """
+    Rows of df whose time lies in [start, end); None leaves a side open.
+    """
+    keep = np.ones(len(df), dtype=bool)
+    if start is not None:
+        keep &= (df[column] >= pd.Timestamp(start)).to_numpy()
+    if end is not None:
+        keep &= (df[column] < pd.Timestamp(end)).to_numpy()
+    return df[keep]
+
+
+def _load_track_files(data_dir, processed_file_pattern, start=None, end=None, storm_column=None):
+    """
+    Yield (path, DataFrame) for the track files of a directory, sorted by
+    name, restricted to the time window and to valid coordinates. Files with
+    unparseable dates or no valid points are reported and skipped; the dates
+    checked are 'dates' and storm_column, by default the first of
+    STORM_START_COLUMNS the file has.
+    """
+    for processed_file in sorted(glob.glob(os.path.join(data_dir, processed_file_pattern))):
+        df = load_tracks(processed_file)
+        columns = [storm_column] if storm_column else [name for name in STORM_START_COLUMNS if name in df.columns][:1]
+        if df['dates'].isnull().any() or df[columns].isnull().any().any():
+            print(f"Warning: File {processed_file} contains unparseable dates. Skipping this file.")
+            continue
+        df = _in_window(df, start, end)
+        df = df[(df['lats'] >= -90) & (df['lats'] <= 90)]
+        if df.empty:
+            print(f"Warning: File {processed_file} contains no valid data. Skipping this file.")
+            continue
+        yield processed_file, df
+
+
+def storm_track_map(data_dir, processed_file_pattern='*_processed.npz', start=None, end=None,
+                    color_by='storm', title='Global storm tracks', dpi=300):
+    """
+    Map of every storm in a directory of track files (the 12.5/12.12
+    get_graph figure), centred on the Pacific, with tracks split at the
+    dateline.
+
+    Parameters:
+    - data_dir: Directory of the converted track files.
+    - processed_file_pattern: Glob pattern of the track files in data_dir.
+    - start, end: Optional time window [start, end) of the points drawn.
+    - color_by: 'storm' cycles STORM_COLORS over the storms of each file;
+      'dataset' gives every file its own colour.
+    - title: Title, followed by the number of storms drawn.
+    - dpi: Resolution the figure will be saved at (for the basemap raster).
+    """
+    fig = plt.figure(figsize=(20, 10))
+    ax = fig.add_subplot(1, 1, 1, projection=ccrs.PlateCarree(central_longitude=180))
+    ax.set_global()
+    add_basemap(ax, dpi=dpi)
+    ax.gridlines(draw_labels=True)
+
+    cmap = plt.get_cmap('tab20', 31)
+    legend_entries = []
+    total_storms = 0
+    for file_idx, (processed_file, df) in enumerate(_load_track_files(data_dir, processed_file_pattern, start, end)):
+        # Longitudes in [0, 360), ordered storm by storm, each storm by time
+        df = sort_tracks(df.assign(lons=df['lons'] % 360), storm_column='storm_id')
+        lons = df['lons'].values
+        lats = df['lats'].values
+        offsets = storm_offsets(df['storm_id'].values)
+        total_storms += len(offsets) - 1
+
+        pieces = split_at_dateline(lons, offsets)
+        piece_coords = split_pieces(lons, lats, pieces)
+        if color_by == 'dataset':
+            color = cmap(file_idx % cmap.N)
+            add_track_segments(ax, piece_coords, color, linewidth=1.0, alpha=0.6)
+            legend_entries.append((Line2D([0], [0], color=color, lw=2),
+                                   os.path.splitext(os.path.basename(processed_file))[0]))
+            continue
+        color_of_piece = (np.searchsorted(offsets, pieces[:-1], side='right') - 1) % len(STORM_COLORS)
+        for color_idx, color in enumerate(STORM_COLORS):
+            add_track_segments(ax, [piece_coords[k] for k in np.flatnonzero(color_of_piece == color_idx)],
+                               color, linewidth=1.0, alpha=0.6)
+
+    if color_by == 'dataset':
+        if legend_entries:
+            handles, labels = zip(*sorted(legend_entries, key=lambda entry: entry[1]))
+            ax.legend(handles, labels, loc='lower left', fontsize='small', ncol=4, bbox_to_anchor=(0, -0.2))
+    else:
+        handles = [mpatches.Patch(color=color, label=color) for color in STORM_COLORS]
+        ax.legend(handles=handles, loc='lower left', fontsize='small', ncol=2, bbox_to_anchor=(0, -0.2))
+    ax.set_title(f'{title} (Total number of storms: {total_storms})')
+    return fig
+
+
+def track_density_map(data_dir, processed_file_pattern='*_processed.npz', start=None, end=None,
+                      resolution=1.0, weight=None, title='Global storm track density', dpi=300):
+    """
+    Track density map of every storm in a directory of track files, for
+    catalogs too large to draw line by line: all segments are rasterized
+    onto a lon/lat grid and drawn with one imshow, centred on the Pacific
+    like storm_track_map.
+
+    Parameters:
+    - data_dir: Directory of the converted track files.
+    - processed_file_pattern: Glob pattern of the track files in data_dir.
+    - start, end: Optional time window [start, end) of the points drawn.
+    - resolution: Grid cell size in degrees.
+    - weight: None counts track length; 'wind_speed' (or another numeric
+      column) weights every segment by the value at its first point, and
+      'category' by its Saffir-Simpson class (1 for TD up to 7 for
+      Category 5).
+    - title: Title, followed by the number of storms drawn.
+    - dpi: Resolution the figure will be saved at (for the basemap raster).
+    """
+    fig = plt.figure(figsize=(20, 10))
+    ax = fig.add_subplot(1, 1, 1, projection=ccrs.PlateCarree(central_longitude=180))
+    ax.set_global()
+    add_basemap(ax, dpi=dpi)
+    ax.gridlines(draw_labels=True)
+
+    extent = (0, 360, -90, 90)
+    density = 0
+    total_storms = 0
+    for processed_file, df in _load_track_files(data_dir, processed_file_pattern, start, end):
+        df = sort_tracks(df, storm_column='storm_id')
+        segments, index = track_segments(df['lons'].values % 360, df['lats'].values, df['storm_id'].values)
+        total_storms += df['storm_id'].nunique()
+        weights = None
+        if weight == 'category':
+            # TD counts 1, Category 5 counts 7, segments without a wind speed 0
+            weights = categorize(df['wind_speed'].values, 'ms')[index] + 1
+        elif weight is not None:
+            weights = df[weight].values[index]
+        density = density + track_density(segments, resolution, extent, weights)
+
+    if total_storms:
+        image = add_track_density(ax, density, extent, cmap='magma_r', norm=mcolors.LogNorm())
+        label = 'Track length (degrees)' if weight is None else f'Track length x {weight}'
+        fig.colorbar(image, ax=ax, orientation='vertical', pad=0.04, shrink=0.7, label=label)
+    ax.set_title(f'{title} (Total number of storms: {total_storms})')
+    return fig
+
+
+def dataset_track_map(data_dir, processed_file_pattern='*_processed.npz', start=None, end=None,
+                      max_distance_km=500, title='Storm Tracks from Multiple Datasets', dpi=300):
+    """
+    Map of the tracks of several datasets, one colour per track file (the
+    11.21 get_combined_graph figure). Tracks break at jumps of
+    max_distance_km or more.
+
+    Parameters:
+    - data_dir: Directory of the converted track files.
+    - processed_file_pattern: Glob pattern of the track files in data_dir.
+    - start, end: Optional time window [start, end) of the points drawn.
+    - max_distance_km: Length from which a step between two points is not drawn.
+    - title: Figure title.
+    - dpi: Resolution the figure will be saved at (for the basemap raster).
+    """
+    fig = plt.figure(figsize=(15, 10))
+    ax = fig.add_subplot(1, 1, 1, projection=ccrs.PlateCarree())
+    ax.set_global()
+    add_basemap(ax, dpi=dpi)
+
+    # Define a colormap that can handle many discrete colors
+    cmap = plt.get_cmap('tab20', 31)
+    legend_entries = []
+    for idx, (processed_file, df) in enumerate(_load_track_files(data_dir, processed_file_pattern, start, end)):
+        # Label-schema files and track stores name the storm initialization time storm_start_time
+        df = df.rename(columns={'storm_start_time': 'fcst_ini_date'})
+        df = sort_tracks(df.assign(lons=np.where(df['lons'] <= 180, df['lons'], df['lons'] - 360)))
+        color = cmap(idx % cmap.N)
+        segments, _ = track_segments(df['lons'].values, df['lats'].values, df['fcst_ini_date'].values,
+                                     max_distance_km=max_distance_km)
+        add_track_segments(ax, segments, color, linewidth=1.5)
+        legend_entries.append((Line2D([0], [0], color=color, lw=2),
+                               os.path.splitext(os.path.basename(processed_file))[0]))
+
+    if legend_entries:
+        handles, labels = zip(*sorted(legend_entries, key=lambda entry: entry[1]))
+        ax.legend(handles, labels, loc='lower left', fontsize='small', ncol=4, bbox_to_anchor=(0, -0.2))
+    ax.set_title(title)
+    return fig
+
+
+def _ibtracs_season(path, season, min_wind=34):
+    """
+    Track points of the storms of one IBTrACS season whose maximum usa_wind
+    exceeds min_wind knots.
+
+    Returns (lons, lats, offsets, max_wind): the valid points of all storms
+    one after another, longitudes in [-180, 180), the storm offsets and the
+    maximum wind of every storm. The season comes from the per-season
+    cache of the file (see stormtools.ibtracs), built on first use.
+    """
+    tracks = season_tracks(path, season)
+    points = tracks['points']
+    max_wind = tracks['storms']['max_usa_wind'].astype(np.float64)
+    storm = np.repeat(np.arange(len(max_wind)), np.diff(tracks['offsets']))
+    strong = max_wind > min_wind
+    lats = points['usa_lat'].astype(np.float64)
+    lons = ((points['usa_lon'].astype(np.float64) + 180) % 360) - 180
+
+    valid = strong[storm] & np.isfinite(lats) & np.isfinite(lons)
+    counts = np.bincount(storm[valid], minlength=len(max_wind))[strong]
+    offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+    return lons[valid], lats[valid], offsets, max_wind[strong]
+
+
+def _draw_ibtracs_tracks(ax, path, season, min_wind=34):
+    """
+    Draw the tracks of an IBTrACS season coloured by the category of each
+    storm's maximum wind, with one collection per category.
+    """
+    lons, lats, offsets, max_wind = _ibtracs_season(path, season, min_wind)
+    pieces = split_at_dateline(lons, offsets)
+    piece_coords = split_pieces(lons, lats, pieces)
+    storm_of_piece = np.searchsorted(offsets, pieces[:-1], side='right') - 1
+    category_of_piece = categorize(max_wind, 'knots')[storm_of_piece]
+    groups = group_by_category(piece_coords, category_of_piece, len(KNOT_CATEGORIES))
+    for (_, _, color), pieces_of_category in zip(KNOT_CATEGORIES, groups):
+        add_track_segments(ax, list(pieces_of_category), color, alpha=0.6)
+    handles = [mpatches.Patch(color=color, label=name) for name, _, color in KNOT_CATEGORIES]
+    ax.legend(handles=handles, loc='lower left', fontsize='small', frameon=False, title="Wind Categories (knots)")
+
+
+def ibtracs_track_map(path, season, min_wind=34, dpi=300):
+    """
+    Robinson map of the IBTrACS storms of a season whose maximum wind
+    exceeds min_wind knots, coloured by category (the 10.3 IBTrACS figure).
+
+    Parameters:
+    - path: IBTrACS netCDF file.
+    - season: Season (year) to draw.
+    - min_wind: Maximum-wind threshold in knots.
+    - dpi: Resolution the figure will be saved at (for the basemap raster).
+    """
+    fig = plt.figure(figsize=(15, 10))
+    ax = fig.add_subplot(1, 1, 1, projection=ccrs.Robinson())
+    ax.set_global()
+    add_basemap(ax, style='ibtracs', dpi=dpi)
+    ax.set_title(f"Storm Tracks with Max Wind Speed > {min_wind} in {season}")
+    _draw_ibtracs_tracks(ax, path, season, min_wind)
+    return fig
+
+
+def comparison_map(ibtracs_path, tracks_path, season, min_wind=34, dpi=300):
+    """
+    IBTrACS tracks of a season above TempestExtremes tracks of the same
+    period (the 10.3 Comparison_in_1980 figure).
+
+    Parameters:
+    - ibtracs_path: IBTrACS netCDF file.
+    - tracks_path: Converted TempestExtremes tracks (see load_tracks).
+    - season: Season (year) of the IBTrACS storms.
+    - min_wind: Maximum-wind threshold in knots for the IBTrACS storms.
+    - dpi: Resolution the figure will be saved at (for the basemap raster).
+    """
+    fig, axes = plt.subplots(nrows=2, figsize=(15, 20), subplot_kw={'projection': ccrs.Robinson()})
+
+    ax1 = axes[0]
+    ax1.set_global()
+    add_basemap(ax1, style='ibtracs', dpi=dpi)
+    ax1.set_title(f"IBTrACS Storm Tracks with Max Wind Speed > {min_wind} in {season}")
+    _draw_ibtracs_tracks(ax1, ibtracs_path, season, min_wind)
+
+    ax2 = axes[1]
+    ax2.set_global()
+    add_basemap(ax2, style='ibtracs', dpi=dpi)
+    ax2.set_title(f'TempestExtremes Storm Tracks from {season}')
+
+    df_te = load_tracks(tracks_path)
+    df_te['lons'] = np.where(df_te['lons'] <= 180, df_te['lons'], df_te['lons'] - 360)
+    df_te = df_te[(df_te['lons'] >= -180) & (df_te['lons'] <= 180) &
+                  (df_te['lats'] >= -90) & (df_te['lats'] <= 90)]
+
+    # One colour per storm, in order of first appearance, each storm in file order
+    codes, unique_storms = pd.factorize(df_te['fcst_ini_date'])
+    keep = codes >= 0
+    order = np.argsort(codes[keep], kind='stable')
+    codes = codes[keep][order]
+    offsets = storm_offsets(codes)
+    coords = split_pieces(df_te['lons'].values[keep][order], df_te['lats'].values[keep][order], offsets)
+    norm = mcolors.Normalize(vmin=0, vmax=len(unique_storms) - 1)
+    cmap = cm.plasma
+    if len(unique_storms):
+        add_track_segments(ax2, coords, cmap(norm(codes[offsets[:-1]])), linewidth=1, alpha=0.6)
+
+    sm = plt.cm.ScalarMappable(cmap=cmap, norm=norm)
+    sm.set_array([])
+    cbar = fig.colorbar(sm, ax=ax2, orientation='vertical', pad=0.02, shrink=0.7)
+    cbar.set_label('Storm Index')
+    fig.tight_layout()
+    return fig
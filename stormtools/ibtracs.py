@@ -0,0 +1,319 @@
+"""
+Per-season cache of IBTrACS best tracks.
+
+The IBTrACS netCDF files are dense (storm, date_time) grids; selecting a
+season with ds.where(ds['season'] == 1980, drop=True) evaluates and
+broadcasts a mask over every cell of the global archive, and every script
+and figure repeats that work. write_ibtracs_cache reads the file once, in
+blocks of storms, and keeps only the valid points in a ragged layout like
+the track archives of stormtools.trackstore:
+
+- points.bin: POINT_DTYPE records of all storms, storm after storm.
+- storm_offsets.bin: int64, points of storm k are points[offsets[k]:offsets[k + 1]].
+- storms.bin: STORM_DTYPE metadata, one record per storm, in file order.
+- season_storms.bin: int64 storm indices sorted by season.
+- seasons.bin: SEASON_DTYPE, the run of season_storms of every season.
+
+Every file is opened with np.memmap, so selecting a season is an index
+lookup plus a slice of the points. The cache lives in IBTRACS_CACHE_DIR
+under a name that changes with the size and mtime of the netCDF file, so an
+updated download gets a new cache.
+
+Build the cache ahead of time with
+
+    python -m stormtools.ibtracs IBTrACS.ALL.v04r01.nc
+"""
+import hashlib
+import os
+import re
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+IBTRACS_CACHE_DIR = os.environ.get('STORMTOOLS_IBTRACS_CACHE',
+                                   os.path.join(os.path.expanduser('~'), '.cache', 'stormtools', 'ibtracs'))
+IBTRACS_CACHE_SUFFIX = '.seasons'
+STORMS_PER_BLOCK = 2000  # storms read from the netCDF file at a time
+
+POINT_DTYPE = np.dtype([
+    ('time', 'datetime64[s]'),
+    ('lat', np.float32),
+    ('lon', np.float32),
+    ('usa_lat', np.float32),
+    ('usa_lon', np.float32),
+    ('usa_wind', np.float32),
+    ('wmo_wind', np.float32),
+    ('basin', 'S2'),
+])
+
+STORM_DTYPE = np.dtype([
+    ('sid', 'S13'),
+    ('season', np.int16),
+    ('n_points', np.int32),
+    ('max_usa_wind', np.float32),
+    ('max_wmo_wind', np.float32),
+])
+
+SEASON_DTYPE = np.dtype([
+    ('season', np.int16),
+    ('first', np.int64),
+    ('count', np.int64),
+])
+
+POINT_VARIABLES = ('lat', 'lon', 'usa_lat', 'usa_lon', 'usa_wind', 'wmo_wind')
+
+TIME_UNITS = {'days': 86400, 'hours': 3600, 'minutes': 60, 'seconds': 1}
+
+
+def ibtracs_cache_path(path, cache_dir=None):
+    """
+    Cache directory of an IBTrACS netCDF file, keyed by its name, size and mtime.
+    """
+    stat = os.stat(path)
+    key = hashlib.sha1(repr((os.path.abspath(path), stat.st_size, stat.st_mtime_ns)).encode()).hexdigest()[:12]
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir or IBTRACS_CACHE_DIR, f"{stem}_{key}{IBTRACS_CACHE_SUFFIX}")
+
+
+def _to_datetime64(values, units):
+    """
+    datetime64[s] of CF 'days/hours/... since <date>' time values, NaT where
+    the values are missing.
+    """
+    match = re.match(r'\s*(\w+)\s+since\s+(.+)', units)
+    if match is None or match.group(1) not in TIME_UNITS:
+        raise ValueError(f"Unsupported time units {units!r}")
+    reference = np.datetime64(pd.Timestamp(match.group(2).strip()).tz_localize(None), 's')
+    values = np.ma.filled(np.ma.asarray(values, dtype=np.float64), np.nan)
+    seconds = np.rint(values * TIME_UNITS[match.group(1)])
+    times = reference + np.where(np.isfinite(seconds), seconds, 0).astype(np.int64).astype('timedelta64[s]')
+    times[~np.isfinite(seconds)] = np.datetime64('NaT')
+    return times
+
+
+def char_strings(values):
+    """
+    Fixed-width byte strings of an IBTrACS char array.
+
+    Parameters:
+    - values: Array of single characters (dtype S1, the characters along
+      the last dimension, as netCDF4 returns sid, basin or iso_time), or an
+      array of strings (as xarray returns them).
+
+    Returns an array of byte strings with the last dimension of a char array
+    viewed as one string, not joined character by character; missing
+    characters become empty.
+    """
+    values = np.ma.filled(np.ma.asarray(values), b'')
+    if values.dtype == np.dtype('S1'):
+        values = np.ascontiguousarray(values)
+        return values.view(f'S{values.shape[-1]}')[..., 0]
+    return values.astype(np.bytes_)
+
+
+def decode_iso_time(iso_time):
+    """
+    datetime64[s] of IBTrACS iso_time values ('YYYY-MM-DD hh:mm:ss').
+
+    Parameters:
+    - iso_time: The iso_time variable as read by netCDF4 (storm, date_time,
+      19) characters, or as strings (storm, date_time) read by xarray.
+
+    Returns a (storm, date_time) datetime64[s] array, NaT where the time is
+    missing. All strings are parsed by one NumPy cast; only a file with
+    malformed times falls back to pandas, which turns them into NaT.
+    """
+    strings = char_strings(iso_time)
+    try:
+        return strings.astype('datetime64[s]')
+    except ValueError:
+        flat = pd.to_datetime(strings.ravel().astype(str), format='%Y-%m-%d %H:%M:%S', errors='coerce')
+        return flat.to_numpy().astype('datetime64[s]').reshape(strings.shape)
+
+
+def _chars(variable, first, last):
+    """
+    Rows first:last of a char variable as fixed-width byte strings.
+    """
+    return char_strings(variable[first:last])
+
+
+def _read_block(dataset, first, last):
+    """
+    Point and storm records of storms first:last of an opened IBTrACS file.
+    """
+    times = _to_datetime64(dataset.variables['time'][first:last], dataset.variables['time'].units)
+    valid = ~np.isnat(times)
+
+    points = np.empty(int(valid.sum()), dtype=POINT_DTYPE)
+    points['time'] = times[valid]
+    storms = np.empty(last - first, dtype=STORM_DTYPE)
+    for name in POINT_VARIABLES:
+        values = np.ma.filled(np.ma.asarray(dataset.variables[name][first:last], dtype=np.float32), np.nan)
+        points[name] = values[valid]
+        if name in ('usa_wind', 'wmo_wind'):
+            # Maximum over the valid points; NaN for a storm without any wind
+            peak = np.max(np.where(np.isnan(values), -np.inf, values), axis=1)
+            storms['max_' + name] = np.where(np.isinf(peak), np.nan, peak)
+    points['basin'] = _chars(dataset.variables['basin'], first, last)[valid]
+
+    storms['sid'] = _chars(dataset.variables['sid'], first, last)
+    storms['season'] = np.ma.filled(dataset.variables['season'][first:last], -1)
+    storms['n_points'] = valid.sum(axis=1)
+    return points, storms
+
+
+def write_ibtracs_cache(path, cache_path=None, storms_per_block=STORMS_PER_BLOCK):
+    """
+    Ingest an IBTrACS netCDF file into a per-season cache.
+
+    Parameters:
+    - path: IBTrACS netCDF file (e.g. IBTrACS.ALL.v04r01.nc).
+    - cache_path: Cache directory to write (ibtracs_cache_path(path) by
+      default). It is built under a temporary name and renamed when
+      complete, so readers never see a partial cache.
+    - storms_per_block: Number of storms read at a time, bounding memory.
+
+    Returns the cache path.
+    """
+    import netCDF4 as nc
+
+    cache_path = cache_path or ibtracs_cache_path(path)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    os.makedirs(tmp_path, exist_ok=True)
+    try:
+        seasons = []
+        with nc.Dataset(path) as dataset, \
+                open(os.path.join(tmp_path, 'points.bin'), 'wb') as f_points, \
+                open(os.path.join(tmp_path, 'storms.bin'), 'wb') as f_storms, \
+                open(os.path.join(tmp_path, 'storm_offsets.bin'), 'wb') as f_offsets:
+            # Char variables come back as raw characters, viewed as strings by _chars
+            dataset.set_auto_chartostring(False)
+            n_storms = dataset.dimensions['storm'].size
+            n_points = 0
+            np.zeros(1, dtype=np.int64).tofile(f_offsets)
+            for first in range(0, n_storms, storms_per_block):
+                points, storms = _read_block(dataset, first, min(first + storms_per_block, n_storms))
+                points.tofile(f_points)
+                storms.tofile(f_storms)
+                (n_points + np.cumsum(storms['n_points'], dtype=np.int64)).tofile(f_offsets)
+                n_points += len(points)
+                seasons.append(storms['season'])
+
+        seasons = np.concatenate(seasons) if seasons else np.empty(0, dtype=np.int16)
+        order = np.argsort(seasons, kind='stable').astype(np.int64)
+        order.tofile(os.path.join(tmp_path, 'season_storms.bin'))
+        values, first, count = np.unique(seasons[order], return_index=True, return_counts=True)
+        table = np.empty(len(values), dtype=SEASON_DTYPE)
+        table['season'] = values
+        table['first'] = first
+        table['count'] = count
+        table.tofile(os.path.join(tmp_path, 'seasons.bin'))
+
+        try:
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            # Another process finished the same cache first
+            if not os.path.isdir(cache_path):
+                raise
+    finally:
+        if os.path.isdir(tmp_path):
+            shutil.rmtree(tmp_path)
+    return cache_path
+
+
+def _memmap(path, dtype):
+    # np.memmap refuses empty files, which a cache without storms has
+    if os.path.getsize(path) == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r')
+
+
+def open_ibtracs_cache(path, cache_dir=None):
+    """
+    Open the per-season cache of an IBTrACS file, building it on first use.
+
+    Parameters:
+    - path: IBTrACS netCDF file, or a cache directory written by
+      write_ibtracs_cache.
+    - cache_dir: Directory of the caches (IBTRACS_CACHE_DIR by default,
+      overridden by the STORMTOOLS_IBTRACS_CACHE variable).
+
+    Returns a dict with the memory-mapped 'points', 'storm_offsets',
+    'storms', 'season_storms' and 'seasons' arrays.
+    """
+    if os.path.isdir(path):
+        cache_path = path
+    else:
+        cache_path = ibtracs_cache_path(path, cache_dir)
+        if not os.path.isdir(cache_path):
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            write_ibtracs_cache(path, cache_path)
+    return {
+        'points': _memmap(os.path.join(cache_path, 'points.bin'), POINT_DTYPE),
+        'storm_offsets': _memmap(os.path.join(cache_path, 'storm_offsets.bin'), np.int64),
+        'storms': _memmap(os.path.join(cache_path, 'storms.bin'), STORM_DTYPE),
+        'season_storms': _memmap(os.path.join(cache_path, 'season_storms.bin'), np.int64),
+        'seasons': _memmap(os.path.join(cache_path, 'seasons.bin'), SEASON_DTYPE),
+    }
+
+
+def season_storm_indices(cache, season):
+    """
+    Indices of the storms of a season in an opened cache, in file order.
+    """
+    table = cache['seasons']
+    k = np.searchsorted(table['season'], season)
+    if k == len(table) or table['season'][k] != season:
+        return np.empty(0, dtype=np.int64)
+    return np.asarray(cache['season_storms'][table['first'][k]:table['first'][k] + table['count'][k]])
+
+
+def season_tracks(path, season, cache_dir=None):
+    """
+    Best-track points of the storms of one season.
+
+    Parameters:
+    - path: IBTrACS netCDF file or cache directory (see open_ibtracs_cache),
+      or an already opened cache.
+    - season: Season (year) to select.
+    - cache_dir: Directory of the caches.
+
+    Returns a dict with 'points' (POINT_DTYPE records, storm after storm),
+    'offsets' (points of storm k are points[offsets[k]:offsets[k + 1]]) and
+    'storms' (STORM_DTYPE records).
+    """
+    cache = path if isinstance(path, dict) else open_ibtracs_cache(path, cache_dir)
+    selected = season_storm_indices(cache, season)
+    starts = cache['storm_offsets'][selected]
+    counts = cache['storm_offsets'][selected + 1] - starts
+    offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+    if len(selected) and selected[-1] - selected[0] == len(selected) - 1:
+        # The storms of a season are consecutive in IBTrACS files: one slice
+        points = np.array(cache['points'][starts[0]:starts[0] + offsets[-1]])
+    else:
+        points = np.asarray(cache['points'])[np.repeat(starts - offsets[:-1], counts) + np.arange(offsets[-1])]
+    return {'points': points, 'offsets': offsets, 'storms': np.array(cache['storms'][selected])}
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the per-season cache of an IBTrACS netCDF file")
+    parser.add_argument('path', type=str, help='IBTrACS netCDF file')
+    parser.add_argument('--cache-dir', type=str, default=None, help='Directory of the caches')
+    args = parser.parse_args(argv)
+
+    start_time = time.perf_counter()
+    cache_path = write_ibtracs_cache(args.path, ibtracs_cache_path(args.path, args.cache_dir))
+    cache = open_ibtracs_cache(cache_path)
+    print(f"Cached {len(cache['storms'])} storms, {len(cache['points'])} points and {len(cache['seasons'])} "
+          f"seasons in {cache_path} ({time.perf_counter() - start_time:.1f} s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,271 @@
+"""
+Matching of detected storm tracks against IBTrACS best tracks.
+
+Every best-track point is placed in one KD-tree as a 3-D unit vector scaled
+to the Earth radius, plus a fourth coordinate holding its time bucket
+(time_step wide) times a spacing larger than the Earth's diameter. A query
+within the chord of radius_km then only finds best-track points of the same
+time bucket, so one nearest-neighbour query per detected point replaces the
+comparison of every detected track with every observed storm.
+
+A detected track is assigned to the observed storm that holds the largest
+fraction of its points; it is a hit when that fraction reaches
+min_fraction, else a false alarm. Observed storms that no track hits are
+misses.
+
+Run with
+
+    python -m stormtools.matching tracks_processed.npz IBTrACS.ALL.v04r01.nc --radius 300 --output matches.csv
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from stormtools.ibtracs import open_ibtracs_cache, season_tracks
+from stormtools.trackgeom import EARTH_RADIUS_KM
+
+MATCH_RADIUS_KM = 300.0
+MIN_MATCH_FRACTION = 0.5
+TIME_STEP = np.timedelta64(6, 'h')
+
+
+def unit_vectors(lons, lats):
+    """
+    (n, 3) points on the sphere of radius EARTH_RADIUS_KM for lon/lat in degrees.
+    """
+    lons = np.radians(np.asarray(lons, dtype=np.float64))
+    lats = np.radians(np.asarray(lats, dtype=np.float64))
+    cos_lat = np.cos(lats)
+    return EARTH_RADIUS_KM * np.column_stack([cos_lat * np.cos(lons), cos_lat * np.sin(lons), np.sin(lats)])
+
+
+def _space_time_points(lons, lats, times, time_step):
+    """
+    KD-tree coordinates: the point on the sphere and the time bucket, spaced
+    further apart than any two points on the sphere.
+    """
+    bucket = np.floor((np.asarray(times).astype('datetime64[s]') - np.datetime64(0, 's')) / time_step + 0.5)
+    return np.column_stack([unit_vectors(lons, lats), bucket * 4 * EARTH_RADIUS_KM])
+
+
+def match_tracks(track, track_times, track_lons, track_lats, storm, storm_times, storm_lons, storm_lats,
+                 radius_km=MATCH_RADIUS_KM, min_fraction=MIN_MATCH_FRACTION, time_step=TIME_STEP):
+    """
+    Assign detected tracks to observed storms.
+
+    Parameters:
+    - track, track_times, track_lons, track_lats: Detected points: track index
+      (non-negative integers), datetime64 time and position in degrees.
+    - storm, storm_times, storm_lons, storm_lats: Observed points, likewise
+      with the storm index of every point.
+    - radius_km: Distance within which a detected point matches an observed
+      point of the same time bucket.
+    - min_fraction: Fraction of the points of a track that must match its
+      storm for a hit.
+    - time_step: Width of the time buckets; times are rounded to the
+      nearest multiple.
+
+    Returns a DataFrame with one row per detected track: 'track', 'points',
+    'storm' (best matching observed storm, -1 for none), 'matched_points',
+    'fraction', 'mean_distance_km' (over the matched points) and 'hit'.
+    """
+    from scipy.spatial import cKDTree
+
+    track = np.asarray(track, dtype=np.int64)
+    track_times, track_lons, track_lats = (np.asarray(track_times).astype('datetime64[s]'),
+                                           np.asarray(track_lons, dtype=np.float64),
+                                           np.asarray(track_lats, dtype=np.float64))
+    storm = np.asarray(storm, dtype=np.int64)
+    storm_times, storm_lons, storm_lats = (np.asarray(storm_times).astype('datetime64[s]'),
+                                           np.asarray(storm_lons, dtype=np.float64),
+                                           np.asarray(storm_lats, dtype=np.float64))
+    n_tracks = int(track.max()) + 1 if len(track) else 0
+    points = np.bincount(track, minlength=n_tracks)
+
+    observed = np.isfinite(storm_lons) & np.isfinite(storm_lats) & ~np.isnat(storm_times)
+    detected = np.isfinite(track_lons) & np.isfinite(track_lats) & ~np.isnat(track_times)
+    hit_storm = np.full(len(track), -1)
+    distance = np.full(len(track), np.nan)
+    if observed.any() and detected.any():
+        tree = cKDTree(_space_time_points(storm_lons[observed], storm_lats[observed], storm_times[observed], time_step))
+        chord = 2 * EARTH_RADIUS_KM * np.sin(radius_km / (2 * EARTH_RADIUS_KM))
+        chord_distance, nearest = tree.query(
+            _space_time_points(track_lons[detected], track_lats[detected], track_times[detected], time_step),
+            k=1, distance_upper_bound=chord)
+        found = np.isfinite(chord_distance)
+        index = np.flatnonzero(detected)[found]
+        hit_storm[index] = storm[observed][nearest[found]]
+        distance[index] = 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1, chord_distance[found] / (2 * EARTH_RADIUS_KM)))
+
+    # Matched points per (track, storm) pair, then the storm with the most per track
+    matched = hit_storm >= 0
+    n_storms = int(max(storm.max(initial=0), hit_storm.max(initial=-1))) + 1
+    pair, pair_index, pair_points = np.unique(track[matched] * n_storms + hit_storm[matched],
+                                              return_inverse=True, return_counts=True)
+    pair_distance = np.bincount(pair_index.ravel(), weights=distance[matched], minlength=len(pair))
+    pair_track, pair_storm = np.divmod(pair, n_storms)
+    best = np.lexsort((-pair_points, pair_track))
+    first = np.ones(len(best), dtype=bool)
+    first[1:] = pair_track[best][1:] != pair_track[best][:-1]
+    best = best[first]
+
+    result = pd.DataFrame({
+        'track': np.arange(n_tracks),
+        'points': points,
+        'storm': -1,
+        'matched_points': 0,
+        'fraction': 0.0,
+        'mean_distance_km': np.nan,
+    })
+    result.loc[pair_track[best], 'storm'] = pair_storm[best]
+    result.loc[pair_track[best], 'matched_points'] = pair_points[best]
+    result.loc[pair_track[best], 'mean_distance_km'] = pair_distance[best] / pair_points[best]
+    result['fraction'] = result['matched_points'] / np.maximum(result['points'], 1)
+    result['hit'] = result['fraction'] >= min_fraction
+    result.loc[~result['hit'], 'storm'] = -1
+    return result
+
+
+def match_summary(matches, n_storms):
+    """
+    Contingency counts of a match table.
+
+    Parameters:
+    - matches: DataFrame returned by match_tracks.
+    - n_storms: Number of observed storms that could have been detected.
+
+    Returns a dict with 'hits' (observed storms matched by at least one
+    track), 'misses', 'false_alarms' (tracks without a storm), 'duplicates'
+    (hit tracks beyond the first of their storm), 'pod' (probability of
+    detection) and 'far' (false alarm ratio).
+    """
+    hit_tracks = int(matches['hit'].sum())
+    hits = int(matches.loc[matches['hit'], 'storm'].nunique())
+    false_alarms = len(matches) - hit_tracks
+    return {
+        'hits': hits,
+        'misses': n_storms - hits,
+        'false_alarms': false_alarms,
+        'duplicates': hit_tracks - hits,
+        'pod': hits / n_storms if n_storms else np.nan,
+        'far': false_alarms / len(matches) if len(matches) else np.nan,
+    }
+
+
+def ibtracs_period_storms(ibtracs_path, first_time, last_time, min_wind=34, cache_dir=None):
+    """
+    IBTrACS storms active during a period.
+
+    Parameters:
+    - ibtracs_path: IBTrACS netCDF file or per-season cache.
+    - first_time, last_time: datetime64 bounds of the period (inclusive).
+    - min_wind: Only storms whose maximum usa_wind exceeds this many knots
+      are eligible, as in the IBTrACS track maps; None keeps every storm.
+    - cache_dir: Directory of the IBTrACS caches.
+
+    Returns (points, storms, storm, eligible): the best-track points and
+    storm records of the seasons around the period, the storm index of every
+    point and a boolean mask of the eligible storms, those strong enough
+    with a point in the period.
+    """
+    cache = open_ibtracs_cache(ibtracs_path, cache_dir)
+    first_time = np.datetime64(first_time, 's')
+    last_time = np.datetime64(last_time, 's')
+
+    # Seasons around the period; southern hemisphere seasons span two years
+    first_year = first_time.astype('datetime64[Y]').astype(int) + 1970
+    last_year = last_time.astype('datetime64[Y]').astype(int) + 1970
+    parts = [season_tracks(cache, season) for season in range(first_year - 1, last_year + 2)]
+    points = np.concatenate([part['points'] for part in parts])
+    storms = np.concatenate([part['storms'] for part in parts])
+    storm = np.repeat(np.arange(len(storms)), storms['n_points'])
+
+    in_period = (points['time'] >= first_time) & (points['time'] <= last_time)
+    eligible = np.bincount(storm[in_period], minlength=len(storms)) > 0
+    if min_wind is not None:
+        eligible &= storms['max_usa_wind'] > min_wind
+    return points, storms, storm, eligible
+
+
+def match_ibtracs(df, ibtracs_path, storm_column='storm_id', min_wind=34, radius_km=MATCH_RADIUS_KM,
+                  min_fraction=MIN_MATCH_FRACTION, time_step=TIME_STEP, cache_dir=None):
+    """
+    Match the tracks of a DataFrame (see stormtools.trackstore.load_tracks)
+    against the IBTrACS storms active during their period.
+
+    Parameters:
+    - df: Detected tracks with 'dates', 'lons' and 'lats' columns.
+    - ibtracs_path: IBTrACS netCDF file or per-season cache.
+    - storm_column: Column identifying the track of every point.
+    - min_wind: Only IBTrACS storms whose maximum usa_wind exceeds this many
+      knots count as observed storms; None keeps every storm.
+    - radius_km, min_fraction, time_step: See match_tracks.
+    - cache_dir: Directory of the IBTrACS caches.
+
+    Returns (matches, summary): the match_tracks table with the track key
+    (column storm_column) and the IBTrACS 'sid' of the matched storm, and
+    the match_summary counts over the IBTrACS storms with a point in the
+    period of the tracks.
+    """
+    df = df[df[storm_column].notna() & df['dates'].notna()]
+    track, keys = pd.factorize(df[storm_column])
+    times = df['dates'].values.astype('datetime64[s]')
+    if len(times):
+        points, storms, storm, eligible = ibtracs_period_storms(ibtracs_path, times.min(), times.max(),
+                                                                min_wind, cache_dir)
+    else:
+        cache = open_ibtracs_cache(ibtracs_path, cache_dir)
+        points = np.empty(0, dtype=cache['points'].dtype)
+        storms = np.empty(0, dtype=cache['storms'].dtype)
+        storm = np.empty(0, dtype=np.int64)
+        eligible = np.empty(0, dtype=bool)
+    keep = eligible[storm]
+
+    matches = match_tracks(track, times, df['lons'].values, df['lats'].values,
+                           storm[keep], points['time'][keep], points['lon'][keep], points['lat'][keep],
+                           radius_km=radius_km, min_fraction=min_fraction, time_step=time_step)
+    matches.insert(1, storm_column, keys[matches['track'].values])
+    matches['sid'] = np.where(matches['storm'] >= 0, storms['sid'][matches['storm'].clip(lower=0).values].astype(str), '')
+    return matches, match_summary(matches, int(eligible.sum()))
+
+
+def print_match_summary(summary, label='Tracks'):
+    """
+    Print the counts of match_summary on one line.
+    """
+    print(f"{label}: {summary['hits']} hits, {summary['misses']} misses, {summary['false_alarms']} false alarms, "
+          f"{summary['duplicates']} duplicates (POD {summary['pod']:.2f}, FAR {summary['far']:.2f})")
+
+
+def main(argv=None):
+    import argparse
+
+    from stormtools.trackstore import load_tracks
+
+    parser = argparse.ArgumentParser(description="Match detected storm tracks against IBTrACS best tracks")
+    parser.add_argument('tracks', nargs='+', type=str, help='Converted track files (see load_tracks)')
+    parser.add_argument('ibtracs', type=str, help='IBTrACS netCDF file')
+    parser.add_argument('--storm-column', type=str, default='storm_id', help='Column identifying the tracks')
+    parser.add_argument('--radius', type=float, default=MATCH_RADIUS_KM, help='Matching radius in km')
+    parser.add_argument('--min-fraction', type=float, default=MIN_MATCH_FRACTION,
+                        help='Fraction of matched points for a hit')
+    parser.add_argument('--min-wind', type=float, default=34, help='IBTrACS storms count when their maximum usa_wind exceeds this')
+    parser.add_argument('--output', type=str, default=None, help='CSV file to write the matches of all files in')
+    args = parser.parse_args(argv)
+
+    tables = []
+    for path in args.tracks:
+        start_time = time.perf_counter()
+        matches, summary = match_ibtracs(load_tracks(path), args.ibtracs, args.storm_column, args.min_wind,
+                                         args.radius, args.min_fraction)
+        print_match_summary(summary, f"{path} ({time.perf_counter() - start_time:.1f} s)")
+        tables.append(matches.assign(file=path))
+    if args.output:
+        pd.concat(tables, ignore_index=True).to_csv(args.output, index=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
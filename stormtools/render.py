@@ -0,0 +1,142 @@
+"""
+Headless batch rendering of report figures.
+
+A figure spec is a dict naming a builder of stormtools.figures under
+'kind', the 'output' image path, an optional 'dpi' and the keyword
+arguments of the builder, e.g.
+
+    {"kind": "storm_tracks", "output": "tracks_2020_06.png", "dpi": 150,
+     "data_dir": "/data/processed", "start": "2020-06-01", "end": "2020-07-01",
+     "color_by": "dataset"}
+
+Figures are drawn with the Agg backend and saved, never shown, so batches
+run in cron jobs and on compute nodes; independent figures are spread over
+a process pool like the file conversions in stormtools.convert.
+
+Run a JSON list of specs with
+
+    python -m stormtools.render specs.json --workers 8 --timings timings.csv
+"""
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+
+# Select the non-interactive backend before pyplot is imported anywhere
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt  # noqa: E402
+
+from stormtools import figures  # noqa: E402
+
+DEFAULT_DPI = 300
+
+FIGURE_BUILDERS = {
+    'storm_tracks': figures.storm_track_map,
+    'track_density': figures.track_density_map,
+    'dataset_tracks': figures.dataset_track_map,
+    'ibtracs_tracks': figures.ibtracs_track_map,
+    'comparison': figures.comparison_map,
+}
+
+
+def render_figure(spec):
+    """
+    Build, save and close one figure, reporting the outcome instead of raising.
+
+    Parameters:
+    - spec: Figure spec, see the module docstring.
+
+    Returns a dict with the 'kind', 'output', 'seconds' and 'error' (None
+    when the figure was saved).
+    """
+    spec = dict(spec)
+    kind = spec.pop('kind', None)
+    output = spec.pop('output', None)
+    dpi = spec.pop('dpi', DEFAULT_DPI)
+    result = {'kind': kind, 'output': output, 'seconds': 0.0, 'error': None}
+    start = time.perf_counter()
+    try:
+        if kind not in FIGURE_BUILDERS:
+            raise ValueError(f"Unknown figure kind {kind!r}, expected one of {sorted(FIGURE_BUILDERS)}")
+        if not output:
+            raise ValueError("Figure spec has no 'output' path")
+        fig = FIGURE_BUILDERS[kind](dpi=dpi, **spec)
+        try:
+            fig.savefig(output, dpi=dpi, bbox_inches='tight')
+        finally:
+            plt.close(fig)
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def render_figures(specs, workers=1):
+    """
+    Render a list of figure specs, optionally in parallel.
+
+    Parameters:
+    - specs: Figure specs, see the module docstring.
+    - workers: Number of worker processes; 1 renders in this process.
+
+    Returns one render_figure result per spec, in the order of specs.
+    """
+    workers = max(1, min(workers, len(specs)))
+    if workers == 1:
+        return [render_figure(spec) for spec in specs]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(render_figure, specs))
+
+
+def print_render_summary(results):
+    """
+    Print one line per figure, in spec order, and the totals.
+    """
+    for result in results:
+        if result['error'] is None:
+            print(f"Image saved as {result['output']} ({result['seconds']:.1f} s)")
+        else:
+            print(f"An error occurred while rendering {result['output']}: {result['error']}")
+    failed = sum(result['error'] is not None for result in results)
+    print(f"Rendered {len(results) - failed} of {len(results)} figures, {failed} failed, "
+          f"{sum(result['seconds'] for result in results):.1f} s of figure time.")
+
+
+def write_timings(results, path):
+    """
+    Write the per-figure results as CSV (kind, output, seconds, error).
+    """
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['kind', 'output', 'seconds', 'error'])
+        writer.writeheader()
+        for result in results:
+            writer.writerow(result)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Render report figures headless from a JSON list of figure specs")
+    parser.add_argument('specs', type=str, help='JSON file holding a list of figure specs')
+    parser.add_argument('--workers', type=int, default=1, help='Number of figures rendered in parallel processes')
+    parser.add_argument('--timings', type=str, default=None, help='CSV file to record the per-figure timings in')
+    args = parser.parse_args(argv)
+
+    with open(args.specs) as f:
+        specs = json.load(f)
+    for spec in specs:
+        if spec.get('output'):
+            os.makedirs(os.path.dirname(os.path.abspath(spec['output'])), exist_ok=True)
+    results = render_figures(specs, workers=args.workers)
+    print_render_summary(results)
+    if args.timings:
+        write_timings(results, args.timings)
+    return 1 if any(result['error'] is not None for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
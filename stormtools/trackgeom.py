@@ -0,0 +1,177 @@
+"""
+Vectorized geometry of storm track catalogs.
+
+A catalog is a set of point arrays (lons, lats, ...) holding all storms one
+after another, each storm sorted by time. The functions here work on the
+whole catalog at once: consecutive-point distances, segment filtering and
+dateline handling are single NumPy passes instead of per-point Python loops.
+"""
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine(lon1, lat1, lon2, lat2):
+    """
+    Great-circle distance in kilometers between points given in decimal
+    degrees. Accepts scalars or arrays of any broadcastable shape.
+    """
+    lon1, lat1, lon2, lat2 = map(np.radians, [lon1, lat1, lon2, lat2])
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+    a = np.sin(dlat / 2.0)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2.0)**2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def sort_tracks(df, storm_column='fcst_ini_date', time_column='dates'):
+    """
+    Rows of a track DataFrame ordered storm by storm, each storm by time.
+
+    This is the order of the old groupby(storm_column) loops with a
+    sort_values(time_column) per group, as one stable sort. Rows without a
+    storm key are dropped, as groupby drops them.
+    """
+    df = df[df[storm_column].notna()]
+    return df.sort_values([storm_column, time_column], kind='mergesort')
+
+
+def track_segments(lons, lats, storms, max_distance_km=None):
+    """
+    Two-point segments between consecutive points of the same storm.
+
+    Parameters:
+    - lons, lats: Point coordinates in degrees, storm after storm.
+    - storms: Storm key of every point (any comparable values); a change of
+      key between two points starts a new storm.
+    - max_distance_km: Segments at least this long are dropped, which breaks
+      tracks at jumps. None keeps every segment.
+
+    Returns (segments, index): a float64 array of shape (n, 2, 2) holding
+    the (lon, lat) end points of every kept segment, and the index of the
+    first point of each segment (to look up per-segment values such as the
+    category). Segments crossing the dateline (|dlon| > 180) get their
+    western end point shifted by +360, so they are drawn across the dateline
+    and not across the whole map.
+    """
+    lons = np.asarray(lons, dtype=np.float64)
+    lats = np.asarray(lats, dtype=np.float64)
+    storms = np.asarray(storms)
+
+    keep = storms[1:] == storms[:-1]
+    if max_distance_km is not None:
+        distance = haversine(lons[:-1], lats[:-1], lons[1:], lats[1:])
+        keep &= distance < max_distance_km
+    index = np.flatnonzero(keep)
+
+    segments = np.empty((len(index), 2, 2))
+    segments[:, 0, 0] = lons[index]
+    segments[:, 0, 1] = lats[index]
+    segments[:, 1, 0] = lons[index + 1]
+    segments[:, 1, 1] = lats[index + 1]
+
+    lon = segments[:, :, 0]
+    crossing = np.abs(lon[:, 1] - lon[:, 0]) > 180
+    west = np.argmin(lon, axis=1)
+    lon[crossing, west[crossing]] += 360
+    return segments, index
+
+
+def storm_offsets(storms):
+    """
+    Offsets of the storms of a catalog from the storm key of every point.
+
+    Storm k holds points offsets[k]:offsets[k + 1]; a change of key between
+    two consecutive points starts a new storm.
+    """
+    storms = np.asarray(storms)
+    if len(storms) == 0:
+        return np.zeros(1, dtype=np.int64)
+    starts = np.flatnonzero(storms[1:] != storms[:-1]) + 1
+    return np.concatenate(([0], starts, [len(storms)])).astype(np.int64)
+
+
+def split_at_dateline(lons, offsets):
+    """
+    Split every storm of a catalog where it jumps across the dateline.
+
+    Parameters:
+    - lons: Longitudes of all storms, one after another (e.g. in [0, 360)).
+    - offsets: Storm offsets, see storm_offsets.
+
+    Returns the offsets of the pieces: the storm boundaries plus a break
+    before every point more than 180 degrees of longitude away from the one
+    before it. Piece k holds points pieces[k]:pieces[k + 1], so the pieces
+    of the whole catalog can be drawn by one LineCollection, or passed to
+    nan_separated for a single plot call.
+    """
+    breaks = np.flatnonzero(np.abs(np.diff(np.asarray(lons, dtype=np.float64))) > 180) + 1
+    return np.union1d(offsets, breaks).astype(np.int64)
+
+
+def nan_separated(values, offsets):
+    """
+    Values of all pieces in one array, with a NaN between consecutive
+    pieces, so matplotlib draws them as separate lines from a single array.
+    """
+    return np.insert(np.asarray(values, dtype=np.float64), offsets[1:-1], np.nan)
+
+
+def split_pieces(lons, lats, offsets):
+    """
+    (n_points, 2) coordinate arrays of the pieces given by offsets, for
+    LineCollection.
+    """
+    return np.split(np.column_stack([lons, lats]), offsets[1:-1])
+
+
+def track_density(segments, resolution=1.0, extent=(-180, 180, -90, 90), weights=None, block_size=2**18):
+    """
+    Rasterize line segments onto a regular lon/lat grid.
+
+    Every segment is sampled at points at most half a cell apart and each
+    sample adds its share of the segment length (times the segment weight)
+    to the cell it falls in, so a cell holds the weighted track length
+    inside it, in degrees. The work grows with the total track length, and
+    drawing the result costs the same for any number of tracks.
+
+    Parameters:
+    - segments: (n, 2, 2) array of (lon, lat) segment end points, e.g. from
+      track_segments.
+    - resolution: Cell size in degrees.
+    - extent: (lon_min, lon_max, lat_min, lat_max) of the grid. A grid
+      spanning 360 degrees of longitude wraps longitudes into it.
+    - weights: Optional weight of every segment (e.g. wind speed).
+    - block_size: Number of segments sampled at a time, bounding memory.
+
+    Returns a (n_lat, n_lon) float64 array, row 0 at lat_min.
+    """
+    lon_min, lon_max, lat_min, lat_max = extent
+    nx = int(round((lon_max - lon_min) / resolution))
+    ny = int(round((lat_max - lat_min) / resolution))
+    wrap = np.isclose(lon_max - lon_min, 360)
+    density = np.zeros(nx * ny)
+
+    for first in range(0, len(segments), block_size):
+        block = np.asarray(segments[first:first + block_size], dtype=np.float64)
+        start = block[:, 0]
+        delta = block[:, 1] - start
+        length = np.hypot(delta[:, 0], delta[:, 1])
+        n = np.maximum(1, np.ceil(2 * length / resolution)).astype(np.int64)
+
+        # Sample k of segment s sits at the middle of the k-th of its n equal parts
+        seg = np.repeat(np.arange(len(block)), n)
+        k = np.arange(len(seg)) - np.repeat(np.cumsum(n) - n, n)
+        t = (k + 0.5) / n[seg]
+        lon = start[seg, 0] + t * delta[seg, 0]
+        lat = start[seg, 1] + t * delta[seg, 1]
+        value = (length / n)[seg]
+        if weights is not None:
+            value = value * np.asarray(weights, dtype=np.float64)[first:first + block_size][seg]
+
+        if wrap:
+            lon = lon_min + (lon - lon_min) % 360
+        ix = np.floor((lon - lon_min) / resolution).astype(np.int64)
+        iy = np.floor((lat - lat_min) / resolution).astype(np.int64)
+        inside = (ix >= 0) & (ix < nx) & (iy >= 0) & (iy < ny) & np.isfinite(value)
+        density += np.bincount(iy[inside] * nx + ix[inside], weights=value[inside], minlength=nx * ny)
+    return density.reshape(ny, nx)
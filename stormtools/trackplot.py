@@ -0,0 +1,202 @@
+"""
+Batch drawing of storm tracks on cartopy maps.
+
+Track maps used to call ax.plot once per two-point segment, which builds one
+Artist per segment and makes cartopy project every one of them separately.
+The helpers here gather the segments of one colour into a single
+LineCollection, so a map holds one Artist per colour or category and its
+coordinates are projected in one call.
+
+The Natural Earth background of the maps is the same in every figure, so
+add_basemap renders it once per projection, extent, style, size and dpi to
+a PNG in a cache directory and composites that raster under the tracks.
+"""
+import hashlib
+import os
+
+import cartopy
+import cartopy.crs as ccrs
+import cartopy.feature as cfeature
+import numpy as np
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+from matplotlib.image import imread
+from matplotlib.lines import Line2D
+
+BASEMAP_CACHE_DIR = os.environ.get('STORMTOOLS_BASEMAP_CACHE',
+                                   os.path.join(os.path.expanduser('~'), '.cache', 'stormtools', 'basemaps'))
+BASEMAP_ZORDER = 1  # below the track lines (Line2D.zorder) like the features it replaces
+
+# Basemap styles: (feature, keyword arguments) drawn in order; 'coastlines'
+# is ax.coastlines(), any other name a cartopy.feature constant
+BASEMAP_STYLES = {
+    # Track maps of the 10.17-12.12 reports
+    'report': (
+        ('coastlines', {}),
+        ('LAND', {'facecolor': 'lightgray'}),
+        ('OCEAN', {'facecolor': 'lightblue'}),
+        ('BORDERS', {'linestyle': ':', 'alpha': 0.5}),
+        ('LAKES', {'alpha': 0.5}),
+        ('RIVERS', {'alpha': 0.5}),
+    ),
+    # IBTrACS and comparison maps of the 10.3 report
+    'ibtracs': (
+        ('coastlines', {}),
+        ('BORDERS', {'linestyle': ':'}),
+        ('LAND', {'facecolor': 'lightgray'}),
+        ('OCEAN', {'facecolor': 'lightskyblue'}),
+    ),
+}
+
+
+def add_track_segments(ax, segments, color, linewidth=1.5, alpha=None, transform=None):
+    """
+    Draw line segments as one LineCollection.
+
+    Parameters:
+    - ax: The cartopy GeoAxes to draw on.
+    - segments: Sequence of segments, each a sequence of (lon, lat) points,
+      or an array of shape (n_segments, n_points, 2).
+    - color: Colour shared by all segments, or an array of one RGBA colour
+      per segment.
+    - linewidth, alpha: Line style, as for ax.plot.
+    - transform: Coordinate system of the points (PlateCarree by default).
+
+    Returns the LineCollection, or None when there are no segments.
+    """
+    if len(segments) == 0:
+        return None
+    collection = LineCollection(
+        segments if isinstance(segments, np.ndarray) else [np.asarray(s) for s in segments],
+        colors=color if np.ndim(color) == 2 else [color],
+        linewidths=linewidth,
+        alpha=alpha,
+        transform=transform if transform is not None else ccrs.PlateCarree(),
+        # Stack like the ax.plot lines it replaces, above the map features
+        zorder=Line2D.zorder,
+    )
+    ax.add_collection(collection)
+    return collection
+
+
+def add_segments_by_color(ax, segments_by_color, linewidth=1.5, alpha=None, transform=None):
+    """
+    Draw one LineCollection per colour.
+
+    Parameters:
+    - ax: The cartopy GeoAxes to draw on.
+    - segments_by_color: Dict of colour -> segments (see add_track_segments).
+    - linewidth, alpha, transform: Passed on to add_track_segments.
+
+    Returns a dict of colour -> LineCollection for the colours with segments.
+    """
+    collections = {}
+    for color, segments in segments_by_color.items():
+        collection = add_track_segments(ax, segments, color, linewidth, alpha, transform)
+        if collection is not None:
+            collections[color] = collection
+    return collections
+
+
+def _render_basemap(path, projection, extent, features, width, height, dpi):
+    """
+    Render the basemap features alone to a transparent PNG of width x height
+    pixels covering extent, written atomically so parallel renderers can
+    share a cache directory.
+    """
+    # A bare Figure with no pyplot state, so no window is ever opened
+    fig = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+    ax = fig.add_axes([0, 0, 1, 1], projection=projection)
+    ax.set_extent(extent, crs=projection)
+    for name, kwargs in features:
+        if name == 'coastlines':
+            ax.coastlines(**kwargs)
+        else:
+            ax.add_feature(getattr(cfeature, name), **kwargs)
+    ax.set_axis_off()
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    fig.savefig(tmp_path, dpi=dpi, format='png', transparent=True)
+    os.replace(tmp_path, path)
+
+
+def add_basemap(ax, style='report', dpi=300, cache_dir=None):
+    """
+    Draw the background map of a GeoAxes from a cached raster.
+
+    The first call for a given projection, extent, style, axes size and dpi
+    draws the Natural Earth features and stores them as a PNG; later calls,
+    in this run or later ones, only composite that image.
+
+    Parameters:
+    - ax: The cartopy GeoAxes, with its figure size and extent already set
+      (e.g. after ax.set_global()).
+    - style: Name of an entry of BASEMAP_STYLES.
+    - dpi: Resolution the figure will be saved at.
+    - cache_dir: Directory of the cached rasters (BASEMAP_CACHE_DIR by
+      default, overridden by the STORMTOOLS_BASEMAP_CACHE variable).
+
+    Returns the path of the cached raster.
+    """
+    features = BASEMAP_STYLES[style]
+    cache_dir = cache_dir or BASEMAP_CACHE_DIR
+    extent = tuple(float(x) for x in np.round(ax.get_extent(crs=ax.projection), 6))
+
+    # Pixel size of the map area when saved at dpi, after equal-aspect shrinking
+    ax.apply_aspect()
+    bbox = ax.get_position()
+    width = max(1, int(round(bbox.width * ax.figure.get_figwidth() * dpi)))
+    height = max(1, int(round(bbox.height * ax.figure.get_figheight() * dpi)))
+
+    key = repr((ax.projection.proj4_init, extent, features, width, height, dpi, cartopy.__version__))
+    path = os.path.join(cache_dir, f"basemap_{style}_{hashlib.sha1(key.encode()).hexdigest()[:16]}.png")
+    if not os.path.exists(path):
+        os.makedirs(cache_dir, exist_ok=True)
+        _render_basemap(path, ax.projection, extent, features, width, height, dpi)
+
+    ax.imshow(imread(path), origin='upper', extent=extent, transform=ax.projection,
+              interpolation='nearest', zorder=BASEMAP_ZORDER)
+    # imshow resets the view limits to the image
+    ax.set_extent(extent, crs=ax.projection)
+    return path
+
+
+def central_longitude(projection):
+    """
+    Central longitude of a PlateCarree projection in degrees. Cartopy keeps
+    it as 'lon_0' in older releases and as the prime meridian 'pm' in
+    newer ones.
+    """
+    params = projection.proj4_params
+    return float(params.get('lon_0', 0)) + float(params.get('pm', 0))
+
+
+def add_track_density(ax, density, extent=(-180, 180, -90, 90), cmap='viridis', norm=None, alpha=None):
+    """
+    Draw a track density grid (see stormtools.trackgeom.track_density) with
+    a single imshow; empty cells stay transparent so the basemap shows.
+
+    Parameters:
+    - ax: The cartopy GeoAxes to draw on.
+    - density: (n_lat, n_lon) grid, row 0 at the southern edge of extent.
+    - extent: (lon_min, lon_max, lat_min, lat_max) of the grid in degrees.
+    - cmap, norm, alpha: Colour mapping, as for imshow.
+
+    Returns the AxesImage, for a colorbar.
+    """
+    view = ax.get_extent(crs=ax.projection)
+    transform = ccrs.PlateCarree()
+    if isinstance(ax.projection, ccrs.PlateCarree) and np.isclose(extent[1] - extent[0], 360):
+        # Roll a global grid into the map's own coordinates instead of letting
+        # cartopy resample the image
+        cell = 360 / density.shape[1]
+        shift = (central_longitude(ax.projection) - 180 - extent[0]) / cell
+        if np.isclose(shift, round(shift)):
+            density = np.roll(density, -int(round(shift)), axis=1)
+            extent = (-180, 180, extent[2], extent[3])
+            transform = ax.projection
+    image = ax.imshow(np.ma.masked_less_equal(density, 0), origin='lower', extent=extent,
+                      transform=transform, cmap=cmap, norm=norm, alpha=alpha,
+                      interpolation='nearest', zorder=Line2D.zorder)
+    # imshow resets the view limits to the image
+    ax.set_extent(view, crs=ax.projection)
+    return image
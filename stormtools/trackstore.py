@@ -0,0 +1,280 @@
+"""
+Binary storage for converted storm tracks.
+
+Two layouts are provided: a columnar .npz track store, loaded whole into a
+DataFrame, and a memory-mapped track archive (see below) that keeps the
+storm structure for O(1) access to single storms.
+
+A track store is an uncompressed NumPy .npz file with one array per column:
+
+- 'dates': datetime64[s] time of every point.
+- 'lats', 'lons', 'wind_speed', 'pa': float32 point values.
+- 'time_since_start_hours': int32 hours since the storm started.
+- 'storm_code': int32 index of every point into the storm dictionary.
+- 'storm_ids', 'storm_start_time': the storm dictionary, one entry per storm.
+
+Times stay datetime64 on disk, so loading a store needs no date parsing.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from stormtools.trajectory import (POINT_COLUMNS, STORMS_PER_CHUNK, TIME_FORMAT, empty_errors,
+                                   iter_trajectory_chunks, merge_errors)
+
+STORE_SUFFIX = '_processed.npz'
+DATE_COLUMNS = ('dates', 'storm_start_time', 'fcst_ini_date')
+
+
+def _chunk_columns(chunk):
+    """
+    Typed store columns for one parsed trajectory chunk.
+    """
+    points = chunk['points']
+    storm_start = chunk['storm_start'][points['storm'] - chunk['first_storm']]
+    columns = {
+        'dates': points['time'],
+        'time_since_start_hours': ((points['time'] - storm_start) // np.timedelta64(1, 'h')).astype(np.int32),
+        'storm_code': points['storm'],
+    }
+    for name, field in POINT_COLUMNS.items():
+        columns[name] = points[field]
+    return columns
+
+
+def write_track_store(filename, output_path, storms_per_chunk=STORMS_PER_CHUNK):
+    """
+    Convert a StitchNodes trajectory file into a columnar .npz track store.
+
+    Parameters:
+    - filename: Path to the .dat file written by StitchNodes.
+    - output_path: Path of the .npz file to write.
+    - storms_per_chunk: Number of storms parsed at a time.
+
+    Returns the number of points written and the error report of the parse.
+    """
+    parts = {}
+    storm_start = []
+    errors = empty_errors()
+    for chunk in iter_trajectory_chunks(filename, storms_per_chunk=storms_per_chunk):
+        errors = merge_errors(errors, chunk['errors'])
+        for name, values in _chunk_columns(chunk).items():
+            parts.setdefault(name, []).append(values)
+        storm_start.append(chunk['storm_start'])
+
+    columns = {name: np.concatenate(values) for name, values in parts.items()}
+    if not columns:
+        columns = {name: np.empty(0, dtype=np.float32) for name in POINT_COLUMNS}
+        columns['dates'] = np.empty(0, dtype='datetime64[s]')
+        columns['time_since_start_hours'] = np.empty(0, dtype=np.int32)
+        columns['storm_code'] = np.empty(0, dtype=np.int32)
+    storm_start = np.concatenate(storm_start) if storm_start else np.empty(0, dtype='datetime64[s]')
+
+    # Storm dictionary: storm_id as written by label_data and the start time
+    columns['storm_ids'] = np.arange(1, len(storm_start) + 1, dtype=np.int32)
+    columns['storm_start_time'] = storm_start.astype('datetime64[s]')
+
+    # Write through a file object so np.savez keeps the exact output name
+    with open(output_path, 'wb') as f:
+        np.savez(f, **columns)
+    return len(columns['dates']), errors
+
+
+def load_track_arrays(path):
+    """
+    Load a track store as a dict of NumPy arrays.
+
+    Parameters:
+    - path: Path to the .npz track store.
+
+    Returns the point columns plus 'storm_id' and 'storm_start_time' expanded
+    per point; the storm dictionary is kept under 'storm_ids' and
+    'storm_start_times'.
+    """
+    with np.load(path) as store:
+        arrays = {name: store[name] for name in store.files}
+    code = arrays.pop('storm_code')
+    arrays['storm_start_times'] = arrays.pop('storm_start_time')
+    arrays['storm_id'] = arrays['storm_ids'][code]
+    arrays['storm_start_time'] = arrays['storm_start_times'][code]
+    return arrays
+
+
+def _read_text_table(path):
+    """
+    Read a whitespace table written with DataFrame.to_string (the
+    convert_dataset.dat files). Every date column spans a date field and a
+    time field; both are parsed separately and added, without joining the
+    two strings first.
+    """
+    with open(path) as f:
+        names = f.readline().split()
+        first_row = f.readline().split()
+    dates = [name for name in names if name in DATE_COLUMNS]
+    # to_string drops the time of day when every value of a column is at midnight
+    split = len(first_row) == len(names) + len(dates)
+    fields = []
+    for name in names:
+        fields += [name, name + ' time'] if name in dates and split else [name]
+    df = pd.read_csv(path, sep=r'\s+', header=None, names=fields, skiprows=1, on_bad_lines='skip')
+    for name in dates:
+        df[name] = pd.to_datetime(df[name], format='%Y-%m-%d', errors='coerce')
+        if split:
+            df[name] += pd.to_timedelta(df.pop(name + ' time'), errors='coerce')
+    return df
+
+
+def load_tracks(path):
+    """
+    Load converted tracks into a DataFrame with datetime64 date columns.
+
+    Parameters:
+    - path: Path to a .npz track store, to a convert_dataset.dat text table,
+      or to a CSV file (e.g. *_processed.csv) whose date columns are then
+      parsed once with a fixed format.
+
+    Returns a DataFrame with the columns of the file; for a track store the
+    label_data columns.
+    """
+    if str(path).endswith('.npz'):
+        arrays = load_track_arrays(path)
+        return pd.DataFrame({
+            'storm_id': arrays['storm_id'],
+            'dates': arrays['dates'],
+            'lats': arrays['lats'],
+            'lons': arrays['lons'],
+            'wind_speed': arrays['wind_speed'],
+            'pa': arrays['pa'],
+            'storm_start_time': arrays['storm_start_time'],
+            'time_since_start_hours': arrays['time_since_start_hours'],
+        })
+
+    if str(path).endswith('.dat'):
+        return _read_text_table(path)
+
+    df = pd.read_csv(path)
+    for name in DATE_COLUMNS:
+        if name in df.columns:
+            df[name] = pd.to_datetime(df[name], format=TIME_FORMAT, errors='coerce')
+    return df
+
+
+# Memory-mapped track archive
+#
+# An archive is a directory of raw binary arrays that keeps the storm
+# structure of the trajectory file (CSR layout):
+#
+# - points.bin: POINT_DTYPE records of all storms, storm after storm.
+# - storm_offsets.bin: int64, points of storm k are points[offsets[k]:offsets[k + 1]].
+# - storms.bin: STORM_DTYPE metadata, one record per storm.
+#
+# Every file is opened with np.memmap, so fetching a storm is an O(1) slice
+# and nothing is read until it is touched.
+
+ARCHIVE_SUFFIX = '_processed.tracks'
+
+POINT_DTYPE = np.dtype([
+    ('dates', 'datetime64[s]'),
+    ('lats', np.float32),
+    ('lons', np.float32),
+    ('wind_speed', np.float32),
+    ('pa', np.float32),
+    ('time_since_start_hours', np.int32),
+])
+
+STORM_DTYPE = np.dtype([
+    ('storm_id', np.int32),
+    ('storm_start_time', 'datetime64[s]'),
+    ('n_points', np.int32),
+    ('max_wind_speed', np.float32),
+    ('min_pa', np.float32),
+])
+
+
+def _chunk_records(chunk):
+    """
+    Point and storm records for one parsed trajectory chunk.
+    """
+    columns = _chunk_columns(chunk)
+    points = np.empty(len(columns['dates']), dtype=POINT_DTYPE)
+    for name in POINT_DTYPE.names:
+        points[name] = columns[name]
+
+    n_storms = len(chunk['storm_length'])
+    counts = np.bincount(chunk['points']['storm'] - chunk['first_storm'], minlength=n_storms)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    nonempty = counts > 0
+
+    storms = np.empty(n_storms, dtype=STORM_DTYPE)
+    storms['storm_id'] = chunk['first_storm'] + np.arange(1, n_storms + 1)
+    storms['storm_start_time'] = chunk['storm_start']
+    storms['n_points'] = counts
+    storms['max_wind_speed'] = np.nan
+    storms['min_pa'] = np.nan
+    if nonempty.any():
+        # Empty storms share their start with the next storm, so reducing over
+        # the non-empty starts only still gives one segment per storm
+        storms['max_wind_speed'][nonempty] = np.maximum.reduceat(points['wind_speed'], starts[nonempty])
+        storms['min_pa'][nonempty] = np.minimum.reduceat(points['pa'], starts[nonempty])
+    return points, storms
+
+
+def write_track_archive(filename, output_dir, storms_per_chunk=STORMS_PER_CHUNK):
+    """
+    Convert a StitchNodes trajectory file into a memory-mapped track archive.
+
+    Parameters:
+    - filename: Path to the .dat file written by StitchNodes.
+    - output_dir: Archive directory to create (e.g. '<name>_processed.tracks').
+    - storms_per_chunk: Number of storms parsed and appended at a time.
+
+    Returns the number of points written and the error report of the parse.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    n_points = 0
+    errors = empty_errors()
+    with open(os.path.join(output_dir, 'points.bin'), 'wb') as f_points, \
+            open(os.path.join(output_dir, 'storms.bin'), 'wb') as f_storms, \
+            open(os.path.join(output_dir, 'storm_offsets.bin'), 'wb') as f_offsets:
+        np.zeros(1, dtype=np.int64).tofile(f_offsets)
+        for chunk in iter_trajectory_chunks(filename, storms_per_chunk=storms_per_chunk):
+            points, storms = _chunk_records(chunk)
+            points.tofile(f_points)
+            storms.tofile(f_storms)
+            (n_points + np.cumsum(storms['n_points'], dtype=np.int64)).tofile(f_offsets)
+            n_points += len(points)
+            errors = merge_errors(errors, chunk['errors'])
+    return n_points, errors
+
+
+def _memmap(path, dtype):
+    # np.memmap refuses empty files, which an archive without storms has
+    if os.path.getsize(path) == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r')
+
+
+def open_track_archive(path):
+    """
+    Open a track archive without loading it.
+
+    Parameters:
+    - path: Archive directory written by write_track_archive.
+
+    Returns a dict with the memory-mapped 'points', 'storm_offsets' and
+    'storms' arrays.
+    """
+    return {
+        'points': _memmap(os.path.join(path, 'points.bin'), POINT_DTYPE),
+        'storm_offsets': _memmap(os.path.join(path, 'storm_offsets.bin'), np.int64),
+        'storms': _memmap(os.path.join(path, 'storms.bin'), STORM_DTYPE),
+    }
+
+
+def storm_points(archive, k):
+    """
+    Points of storm k (0-based) of an opened archive, as a memory-mapped slice.
+    """
+    offsets = archive['storm_offsets']
+    return archive['points'][offsets[k]:offsets[k + 1]]
@@ -0,0 +1,757 @@
+"""
+Readers for StitchNodes trajectory (.dat) files.
+
+A trajectory file is a sequence of storms. Each storm starts with a header
+
+    start   M   year   month   day   hour
+
+followed by M point rows
+
+    i   j   <--in_fmt columns...>   year   month   day   hour
+
+The readers here locate the headers once and hand all point rows to NumPy in
+a single bulk parse instead of splitting and converting every line in Python.
+
+The point columns are named by the StitchNodes --in_fmt string, and output
+schemas map DataFrame columns onto those names, so every report script reads
+its files through read_trajectories with its own in_fmt and schema.
+"""
+import datetime
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+START = b'start'
+DATE_COLUMNS = 4  # year, month, day, hour close every point row
+READ_SIZE = 64 * 2**20  # bytes read at a time by the streaming readers
+STORMS_PER_CHUNK = 10000
+INITIAL_POINTS = 2**16  # smallest point buffer allocated by parse_trajectories
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'  # text form of times in CSV and text exports
+MAX_REPORTED_LINES = 20  # line numbers kept by a parse error report
+
+ERROR_KINDS = ('short_rows', 'bad_values', 'bad_dates', 'bad_headers', 'orphan_rows', 'missing_rows')
+
+DEFAULT_IN_FMT = 'lon,lat,slp,wind,PHIS'
+
+# Output schemas: DataFrame column -> --in_fmt field, or one of the derived
+# fields 'storm_id' (1-based), 'valid_time', 'storm_start' and 'lead_hours'
+SCHEMAS = {
+    # 12.5/12.12 label_data.py
+    'label': {
+        'storm_id': 'storm_id',
+        'dates': 'valid_time',
+        'lats': 'lat',
+        'lons': 'lon',
+        'wind_speed': 'wind',
+        'pa': 'slp',
+        'storm_start_time': 'storm_start',
+        'time_since_start_hours': 'lead_hours',
+    },
+    # 10.17 ERA5 and 11.21 NeuralGCM forecasts
+    'forecast': {
+        'dates': 'valid_time',
+        'lats': 'lat',
+        'lons': 'lon',
+        'wind_speed': 'wind',
+        'pa': 'slp',
+        'fcst_ini_date': 'storm_start',
+        'lead_time_hours': 'lead_hours',
+    },
+    # 9.19/10.3 MERRA2 and 10.10 ERA5 convert_dataset.dat
+    'forecast_vs': {
+        'dates': 'valid_time',
+        'lats': 'lat',
+        'lons': 'lon',
+        'vs': 'wind',
+        'pa': 'slp',
+        'fcst_ini_date': 'storm_start',
+        'lead_time_hours': 'lead_hours',
+    },
+    # 10.24 ERA5 0.25 degree
+    'era5': {
+        'dates': 'valid_time',
+        'lats': 'lat',
+        'lons': 'lon',
+        'pressure': 'slp',
+        'wind_speed': 'wind',
+        'fcst_ini_date': 'storm_start',
+        'lead_time_hours': 'lead_hours',
+    },
+    # 10.24 1.4 degree runs, tracked with --in_fmt "lon,lat,slp,PHIS"
+    'pressure': {
+        'dates': 'valid_time',
+        'lats': 'lat',
+        'lons': 'lon',
+        'pressure': 'slp',
+        'fcst_ini_date': 'storm_start',
+        'lead_time_hours': 'lead_hours',
+    },
+}
+DERIVED_FIELDS = ('storm_id', 'valid_time', 'storm_start', 'lead_hours')
+POINT_FIELDS = ('i', 'j', 'time', 'storm')  # fields every point record has
+
+
+def in_fmt_columns(in_fmt=DEFAULT_IN_FMT):
+    """
+    Row positions of the fields named by a StitchNodes --in_fmt string.
+
+    Point rows hold i and j, then one column per --in_fmt field, then the
+    date, so 'lon,lat,slp,PHIS' gives {'lon': 2, 'lat': 3, 'slp': 4, 'phis': 5}.
+    Field names are matched case-insensitively.
+    """
+    fields = [name.strip().lower() for name in in_fmt.split(',')]
+    if not all(fields) or len(set(fields)) != len(fields):
+        raise ValueError(f"Invalid --in_fmt string: {in_fmt!r}")
+    clash = set(fields) & set(DERIVED_FIELDS + POINT_FIELDS)
+    if clash:
+        raise ValueError(f"--in_fmt field names {sorted(clash)} are reserved")
+    return {name: 2 + k for k, name in enumerate(fields)}
+
+
+def point_dtype(in_fmt=DEFAULT_IN_FMT):
+    """
+    Structured dtype of one track point for an --in_fmt string.
+
+    Fields are the grid indices 'i' and 'j' (int16), one float32 field per
+    --in_fmt field (lower case), 'time' (datetime64[s]) and 'storm' (int32,
+    0-based index of the storm in the file): 36 bytes for the default
+    --in_fmt against 104 for float64 rows plus int64 storm index and time.
+    """
+    return np.dtype([('i', np.int16), ('j', np.int16)] +
+                    [(name, np.float32) for name in in_fmt_columns(in_fmt)] +
+                    [('time', 'datetime64[s]'), ('storm', np.int32)])
+
+
+# Point fields of the label_data columns for DEFAULT_IN_FMT
+POINT_COLUMNS = {name: field for name, field in SCHEMAS['label'].items() if field not in DERIVED_FIELDS}
+
+
+def _resolve_schema(schema, in_fmt):
+    """
+    Check a schema (name or dict) against an --in_fmt string.
+
+    Returns the schema dict and the row positions of the --in_fmt fields.
+    """
+    if isinstance(schema, str):
+        if schema not in SCHEMAS:
+            raise ValueError(f"Unknown schema {schema!r}, expected one of {sorted(SCHEMAS)}")
+        schema = SCHEMAS[schema]
+    columns = in_fmt_columns(in_fmt)
+    for name, field in schema.items():
+        if field not in DERIVED_FIELDS and field.lower() not in columns:
+            raise ValueError(f"Column {name!r} needs field {field!r}, which --in_fmt {in_fmt!r} does not provide")
+    return schema, columns
+
+
+def _scan_lines(data):
+    """
+    Classify every line of a trajectory buffer in one vectorized pass.
+
+    Parameters:
+    - data: File contents as bytes, ending with a newline.
+
+    Returns the byte offsets where each line starts and ends, and boolean
+    masks of the `start` header lines and of the blank lines.
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    line_ends = np.flatnonzero(buf == ord('\n'))
+    line_starts = np.empty_like(line_ends)
+    line_starts[:1] = 0
+    line_starts[1:] = line_ends[:-1] + 1
+    is_blank = line_starts == line_ends
+    # Point rows only hold numbers, so any line opening with 's' is a header
+    is_header = ~is_blank & (buf[np.minimum(line_starts, max(len(buf) - 1, 0))] == START[0])
+    return line_starts, line_ends, is_header, is_blank
+
+
+def to_datetime64(year, month, day, hour):
+    """
+    Build datetime64[s] values from integer date component arrays.
+
+    Returns the timestamps and a boolean mask of the components that form a
+    real calendar date (the rest would have raised in datetime.datetime).
+    """
+    year = np.asarray(year, dtype=np.int64)
+    month = np.asarray(month, dtype=np.int64)
+    day = np.asarray(day, dtype=np.int64)
+    hour = np.asarray(hour, dtype=np.int64)
+
+    month_start = ((year - 1970) * 12 + (month - 1)).astype('datetime64[M]')
+    times = (
+        month_start.astype('datetime64[D]').astype('datetime64[s]') +
+        ((day - 1) * 86400 + hour * 3600).astype('timedelta64[s]')
+    )
+    # An out-of-range day spills into another month, which gives it away
+    valid = (
+        (month >= 1) & (month <= 12) &
+        (day >= 1) & (day <= 31) &
+        (hour >= 0) & (hour <= 23) &
+        (times.astype('datetime64[M]') == month_start)
+    )
+    return times, valid
+
+
+def format_datetimes(values):
+    """
+    Format datetime64 values as 'YYYY-MM-DD HH:MM:SS' strings in one pass.
+
+    Track points sit on a few hundred distinct 6-hourly times, so only the
+    unique values are formatted and the strings are gathered back.
+    """
+    values = np.asarray(values, dtype='datetime64[s]')
+    inverse, uniq = pd.factorize(values.ravel())
+    text = np.datetime_as_string(np.asarray(uniq, dtype='datetime64[s]'), unit='s')
+    if text.size:
+        # ISO output uses a 'T' separator; overwrite it through a per-character view
+        text.view('U1').reshape(text.size, -1)[:, 10] = ' '
+    return text.astype(object)[inverse.reshape(values.shape)]
+
+
+def format_time_columns(df):
+    """
+    Copy of a DataFrame with its datetime64 columns formatted as
+    'YYYY-MM-DD HH:MM:SS' text, for CSV and to_string exports.
+    """
+    df = df.copy()
+    for name in df.columns:
+        if pd.api.types.is_datetime64_dtype(df[name]):
+            df[name] = format_datetimes(df[name].to_numpy())
+    return df
+
+
+def write_text_table(df, output_path):
+    """
+    Write a DataFrame as a DataFrame.to_string table (the convert_dataset.dat
+    layout). Times are written as text, and float32 point fields are widened
+    to the float64 of their shortest decimal form, so the table shows the
+    values as written in the trajectory file rather than their binary
+    expansion.
+    """
+    df = format_time_columns(df)
+    for name in df.columns:
+        if df[name].dtype == np.float32:
+            df[name] = df[name].astype(str).astype(np.float64)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(df.to_string(index=False, header=True))
+
+
+def empty_errors():
+    """
+    Error report of a parse that found nothing wrong.
+
+    Counts, per kind of problem, of the lines the parsers drop:
+    - 'short_rows': point rows with fewer fields than the --in_fmt string
+      needs. Blank (empty or whitespace-only) lines are skipped by both
+      parse paths and never take the place of a row.
+    - 'bad_values': point rows with a field that is not a finite number.
+    - 'bad_dates': point rows whose date is not a calendar date.
+    - 'bad_headers': `start` lines that do not parse or whose date is not a
+      calendar date. Within the M rows of
+      a storm one takes the place of a row, as in the original reader, and
+      the storm goes on; elsewhere the rows after it are dropped as orphans.
+    - 'orphan_rows': non-blank lines outside the M rows of a storm.
+    - 'missing_rows': rows announced by storm headers but not in the file.
+    'lines' holds the 1-based file line numbers of the first
+    MAX_REPORTED_LINES dropped lines.
+    """
+    report = {kind: 0 for kind in ERROR_KINDS}
+    report['lines'] = ()
+    return report
+
+
+def merge_errors(report, other):
+    """
+    Add the error report of a later part of the same file to report.
+    """
+    merged = {kind: report[kind] + other[kind] for kind in ERROR_KINDS}
+    merged['lines'] = (report['lines'] + other['lines'])[:MAX_REPORTED_LINES]
+    return merged
+
+
+def has_errors(report):
+    """
+    Whether an error report records any dropped or missing line.
+    """
+    return any(report[kind] for kind in ERROR_KINDS)
+
+
+def dropped_rows(report):
+    """
+    Number of point rows an error report says were dropped.
+    """
+    return report['short_rows'] + report['bad_values'] + report['bad_dates']
+
+
+def _field_counts(data, line_starts, line_ends):
+    """
+    Number of whitespace-separated fields on every line, counted in bulk.
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    space = (buf == ord(' ')) | (buf == ord('\t')) | (buf == ord('\r')) | (buf == ord('\n'))
+    # A field starts at every non-space byte that follows a space (or the buffer start)
+    field_start = ~space
+    field_start[1:] &= space[:-1]
+    # Every line ends with its newline, so no segment is empty
+    return np.add.reduceat(field_start, line_starts, dtype=np.int32) if len(line_starts) else line_starts
+
+
+def _select_lines(data, line_starts, line_ends, keep):
+    """
+    The kept lines of a buffer as one newline-separated bytes object, gathered
+    with a byte mask instead of a Python join.
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    edges = np.zeros(len(buf) + 1, dtype=np.int8)
+    edges[line_starts[keep]] += 1
+    edges[line_ends[keep] + 1] -= 1  # each line keeps its newline
+    return buf[np.cumsum(edges[:-1], dtype=np.int8).astype(bool)].tobytes()
+
+
+def _parse_rows_tolerant(data, line_starts, line_ends, rows_mask, ncols, n_fields=None):
+    """
+    Bulk fallback for files whose point rows are ragged or corrupt.
+
+    Field counts of all lines are taken with one vectorized pass, the rows
+    with enough fields are parsed by one whitespace-separated C-parser call,
+    and fields that are not numbers come back as NaN instead of raising.
+
+    Returns float64 rows (one per line of rows_mask with at least ncols
+    fields, first ncols fields only) and the mask of those lines. n_fields
+    may hold the field counts of the lines when the caller has them.
+    """
+    if n_fields is None:
+        n_fields = _field_counts(data, line_starts, line_ends)
+    parsed = rows_mask & (n_fields >= ncols)
+    if not parsed.any():
+        return np.empty((0, ncols)), parsed
+    df = pd.read_csv(io.BytesIO(_select_lines(data, line_starts, line_ends, parsed)), sep=r'\s+',
+                     header=None, names=range(int(n_fields[parsed].max())), usecols=range(ncols),
+                     engine='c', low_memory=False)
+    for name in df.columns:
+        if not pd.api.types.is_numeric_dtype(df[name]):
+            df[name] = pd.to_numeric(df[name], errors='coerce')
+    return df.to_numpy(dtype=np.float64), parsed
+
+
+def _append_points(buffer, size, points):
+    """
+    Append point records to a preallocated buffer, doubling it in place
+    when it is full. Returns the buffer and its new fill size.
+    """
+    end = size + len(points)
+    if end > len(buffer):
+        # The buffer is never handed out before parsing ends, so realloc is safe
+        buffer.resize(max(end, 2 * len(buffer)), refcheck=False)
+    buffer[size:end] = points
+    return buffer, end
+
+
+def parse_trajectories(filename, in_fmt=DEFAULT_IN_FMT, read_size=READ_SIZE):
+    """
+    Parse a StitchNodes trajectory file in bulk.
+
+    The header lines are found with one vectorized scan of the raw bytes and
+    the point rows of every storm are parsed by a single pandas C-parser call
+    per read_size block (header lines are skipped as comments). Blocks that
+    do not hold exactly M well-formed rows per storm fall back to a tolerant
+    bulk reader that drops the bad lines and counts them by kind instead of
+    raising or printing per line. Points are written straight into a preallocated
+    point_dtype buffer that grows as needed, so the float64 staging rows
+    only ever exist for one block.
+
+    Parameters:
+    - filename: Path to the .dat file written by StitchNodes.
+    - in_fmt: The --in_fmt string passed to StitchNodes.
+    - read_size: Number of bytes read and parsed at a time.
+
+    Returns a dict:
+    - 'points': point_dtype(in_fmt) record of every point.
+    - 'storm_start': datetime64[s] start time of every storm.
+    - 'storm_length': point count M announced by every storm header.
+    - 'errors': error report of the dropped lines, see empty_errors.
+    - 'first_storm': index of the first storm (0 for a whole file).
+    """
+    # StitchNodes rows take about 80 bytes, so this rarely needs to grow
+    buffer = np.empty(max(os.path.getsize(filename) // 64, INITIAL_POINTS), dtype=point_dtype(in_fmt))
+    size = 0
+    storm_start = []
+    storm_length = []
+    errors = empty_errors()
+    for chunk in iter_trajectory_chunks(filename, read_size=read_size, in_fmt=in_fmt):
+        buffer, size = _append_points(buffer, size, chunk['points'])
+        storm_start.append(chunk['storm_start'])
+        storm_length.append(chunk['storm_length'])
+        errors = merge_errors(errors, chunk['errors'])
+    buffer.resize(size, refcheck=False)
+    return {
+        'points': buffer,
+        'storm_start': np.concatenate(storm_start) if storm_start else np.empty(0, dtype='datetime64[s]'),
+        'storm_length': np.concatenate(storm_length) if storm_length else np.empty(0, dtype=np.int64),
+        'errors': errors,
+        'first_storm': 0,
+    }
+
+
+def _parse_buffer(data, first_storm=0, in_fmt=DEFAULT_IN_FMT, first_line=0):
+    """
+    Parse the storms held in a bytes buffer (see parse_trajectories).
+    first_line is the number of file lines before the buffer.
+    """
+    columns = in_fmt_columns(in_fmt)
+    ncols = 2 + len(columns) + DATE_COLUMNS
+    if data and not data.endswith(b'\n'):
+        data += b'\n'
+
+    line_starts, line_ends, is_header, is_blank = _scan_lines(data)
+    header_lines = np.flatnonzero(is_header)
+
+    header_fields = []
+    header_valid = np.zeros(len(header_lines), dtype=bool)
+    for k, line in enumerate(header_lines):
+        values = _parse_header(data[line_starts[line]:line_ends[line]])
+        if values is not None:
+            header_fields.append(values)
+            header_valid[k] = True
+
+    header_fields = np.array(header_fields, dtype=np.int64).reshape(-1, 5)
+    counts = header_fields[:, 0]
+    storm_start, _ = to_datetime64(*header_fields[:, 1:].T)
+
+    # Fast path: every header is valid and followed by exactly M point rows
+    rows = None
+    errors = empty_errors()
+    bad_lines = []
+    is_row = ~is_header & ~is_blank
+    owner = np.cumsum(is_header)[is_row] - 1
+    if header_valid.all() and not (owner < 0).any() and \
+            np.array_equal(np.bincount(owner, minlength=len(counts)), counts) and counts.sum():
+        try:
+            rows = pd.read_csv(io.BytesIO(data), sep='\t', comment='s', header=None,
+                               dtype=np.float64, engine='c').to_numpy()
+        except ValueError:
+            rows = None
+        if rows is not None and np.isnan(rows[:, 0]).all():
+            rows = rows[:, 1:]  # StitchNodes indents point rows with a tab
+        if rows is not None and rows.shape[1] < ncols and np.isfinite(rows).all():
+            raise ValueError(f"Expected at least {ncols} columns per point for --in_fmt {in_fmt!r}, "
+                             f"found {rows.shape[1]}")
+        if rows is not None and (len(rows) != counts.sum() or not np.isfinite(rows[:, :ncols]).all()):
+            rows = None
+        if rows is not None:
+            storm_index = np.repeat(np.arange(len(counts), dtype=np.int64), counts)
+            row_lines = np.flatnonzero(is_row)
+    if rows is None:
+        # Each valid storm owns the first M non-blank lines after its header,
+        # as in the original reader. Blank lines are skipped, as the fast
+        # path's C parser skips them, so both paths own the same rows. A
+        # malformed header among the M lines takes the place of one row
+        # without ending the storm. Lines before the first valid header
+        # belong to storm -1, which owns none
+        n_fields = _field_counts(data, line_starts, line_ends)
+        valid_header = is_header.copy()
+        valid_header[header_lines[~header_valid]] = False
+        storm_of_line = np.cumsum(valid_header) - 1
+        slot = ~valid_header & (n_fields > 0)
+        slots_seen = np.cumsum(slot)
+        header_slots = np.concatenate(([0], slots_seen[valid_header]))
+        length = np.concatenate(([0], counts))
+
+        position = slots_seen - header_slots[storm_of_line + 1] - 1
+        owned = slot & (storm_of_line >= 0)
+        owned &= position < length[storm_of_line + 1]
+        is_row_slot = owned & ~is_header
+
+        rows, parsed = _parse_rows_tolerant(data, line_starts, line_ends, is_row_slot, ncols, n_fields)
+        finite = np.isfinite(rows).all(axis=1)
+        row_lines = np.flatnonzero(parsed)[finite]
+        rows = rows[finite]
+        storm_index = storm_of_line[row_lines]
+
+        short = is_row_slot & ~parsed
+        orphans = is_row & (n_fields > 0) & ~owned
+        bad_headers = header_lines[~header_valid]
+        errors['short_rows'] = int(short.sum())
+        errors['bad_values'] = int((~finite).sum())
+        errors['bad_headers'] = len(bad_headers)
+        errors['orphan_rows'] = int(orphans.sum())
+        errors['missing_rows'] = int(counts.sum() - owned.sum())
+        bad_lines = [np.flatnonzero(short), np.flatnonzero(parsed)[~finite], np.flatnonzero(orphans), bad_headers]
+
+    date_parts = rows[:, ncols - DATE_COLUMNS:ncols].astype(np.int64)
+    valid_time, valid = to_datetime64(*date_parts.T)
+    if not valid.all():
+        errors['bad_dates'] = int((~valid).sum())
+        bad_lines.append(row_lines[~valid])
+        rows, storm_index, valid_time = rows[valid], storm_index[valid], valid_time[valid]
+    if has_errors(errors):
+        bad_lines = np.sort(np.concatenate(bad_lines))[:MAX_REPORTED_LINES]
+        errors['lines'] = tuple(int(line) for line in first_line + bad_lines + 1)
+
+    points = np.empty(len(rows), dtype=point_dtype(in_fmt))
+    points['i'] = rows[:, 0]
+    points['j'] = rows[:, 1]
+    for name, col in columns.items():
+        points[name] = rows[:, col]
+    points['time'] = valid_time
+    points['storm'] = first_storm + storm_index
+
+    return {
+        'points': points,
+        'storm_start': storm_start,
+        'storm_length': counts,
+        'errors': errors,
+        'first_storm': first_storm,
+    }
+
+
+def _parse_header(line):
+    """
+    The five integers (M, year, month, day, hour) of a `start` header line,
+    or None if the line is not a valid header: too few fields, a field that
+    is not an integer, a negative M or a start that is not a calendar date.
+    The chunk reader splits storms with the same test.
+    """
+    fields = line.split()
+    if fields[:1] != [START] or len(fields) < 6:
+        return None
+    try:
+        values = [int(x) for x in fields[1:6]]
+        datetime.datetime(*values[1:])
+    except (ValueError, OverflowError):
+        return None
+    return values if values[0] >= 0 else None
+
+
+def _is_header_at(data, offset):
+    """
+    Whether the complete line at offset is a valid `start` header; None
+    while the line has no newline yet.
+    """
+    end = data.find(b'\n', offset)
+    if end < 0:
+        return None
+    return _parse_header(data[offset:end]) is not None
+
+
+def _header_offsets(data, start=0, at_eof=False):
+    """
+    Byte offsets of the valid `start` header lines that begin at or after
+    start. Storms are only split at valid headers, so a malformed header
+    stays with the storm it interrupts. Scanning stops at a header line
+    without its newline yet, unless at_eof.
+    """
+    offsets = []
+    line = 0 if start == 0 and data.startswith(START) else None
+    pos = data.find(b'\n' + START, max(start - 1, 0))
+    while True:
+        if line is None:
+            if pos < 0:
+                break
+            line = pos + 1
+            pos = data.find(b'\n' + START, line)
+        valid = _is_header_at(data, line)
+        if valid is None and at_eof:
+            valid = _parse_header(data[line:]) is not None
+        if valid is None:
+            break
+        if valid:
+            offsets.append(line)
+        line = None
+    return offsets
+
+
+def _last_header(data):
+    """
+    Byte offset of the last complete, valid `start` header line after the
+    first byte, or 0 if there is none.
+    """
+    pos = len(data)
+    while pos > 0:
+        pos = data.rfind(b'\n' + START, 0, pos)
+        if pos >= 0 and _is_header_at(data, pos + 1):
+            return pos + 1
+    return 0
+
+
+def iter_trajectory_chunks(filename, storms_per_chunk=None, read_size=READ_SIZE, in_fmt=DEFAULT_IN_FMT):
+    """
+    Parse a trajectory file in chunks of whole storms with bounded memory.
+
+    The file is read read_size bytes at a time and only complete storms are
+    handed to the bulk parser, so peak memory depends on the read size and
+    the chunk size, not on the size of the file.
+
+    Parameters:
+    - filename: Path to the .dat file written by StitchNodes.
+    - storms_per_chunk: Number of storms per chunk. None yields every complete
+      storm found after each read.
+    - read_size: Number of bytes read from the file at a time.
+    - in_fmt: The --in_fmt string passed to StitchNodes.
+
+    Yields dicts with the same keys as parse_trajectories. 'first_storm'
+    gives the index of the chunk's first storm within the file; the 'storm'
+    field of the points counts from the start of the file as well.
+    """
+    first_storm = 0
+    first_line = 0
+    pending = b''
+    offsets = []
+    with open(filename, 'rb') as f:
+        while True:
+            block = f.read(read_size)
+            at_eof = not block
+            if storms_per_chunk is None:
+                # Everything up to the last header holds complete storms
+                pending += block
+                cut = len(pending) if at_eof else _last_header(pending)
+                if cut:
+                    chunk = _parse_buffer(pending[:cut], first_storm, in_fmt, first_line)
+                    if len(chunk['storm_length']) or has_errors(chunk['errors']):
+                        first_storm += len(chunk['storm_length'])
+                        yield chunk
+                    first_line += pending.count(b'\n', 0, cut)
+                    pending = pending[cut:]
+                if at_eof:
+                    break
+                continue
+
+            # Rescan from the last incomplete line, whose header may now be complete
+            scan_from = pending.rfind(b'\n') + 1
+            pending += block
+            offsets += [o for o in _header_offsets(pending, scan_from, at_eof) if not offsets or o > offsets[-1]]
+
+            # The last storm in the buffer may still be growing until EOF
+            complete = len(offsets) if at_eof else len(offsets) - 1
+            step = storms_per_chunk or complete
+            consumed = 0
+            cut = 0
+            while complete - consumed > 0 and (complete - consumed >= step or at_eof):
+                n = min(step, complete - consumed)
+                begin = cut
+                cut = offsets[consumed + n] if consumed + n < len(offsets) else len(pending)
+                chunk = _parse_buffer(pending[begin:cut], first_storm, in_fmt, first_line)
+                first_storm += len(chunk['storm_length'])
+                first_line += pending.count(b'\n', begin, cut)
+                consumed += n
+                yield chunk
+            pending = pending[cut:]
+            offsets = [o - cut for o in offsets[consumed:]]
+            if at_eof:
+                break
+
+
+def iter_storms(filename, read_size=READ_SIZE, in_fmt=DEFAULT_IN_FMT):
+    """
+    Yield the storms of a trajectory file one at a time.
+
+    Parameters:
+    - filename: Path to the .dat file written by StitchNodes.
+    - read_size: Number of bytes read from the file at a time.
+    - in_fmt: The --in_fmt string passed to StitchNodes.
+
+    Yields dicts with 'storm_index', 'storm_start', 'storm_length', and the
+    'points' records of the storm.
+    """
+    for chunk in iter_trajectory_chunks(filename, read_size=read_size, in_fmt=in_fmt):
+        n_storms = len(chunk['storm_length'])
+        storms = chunk['first_storm'] + np.arange(n_storms + 1)
+        bounds = np.searchsorted(chunk['points']['storm'], storms)
+        for k in range(n_storms):
+            yield {
+                'storm_index': storms[k],
+                'storm_start': chunk['storm_start'][k],
+                'storm_length': chunk['storm_length'][k],
+                'points': chunk['points'][bounds[k]:bounds[k + 1]],
+            }
+
+
+def trajectory_frame(parsed, in_fmt=DEFAULT_IN_FMT, schema='label'):
+    """
+    Build a DataFrame from parsed trajectory arrays.
+
+    Parameters:
+    - parsed: Dict returned by parse_trajectories or iter_trajectory_chunks.
+    - in_fmt: The --in_fmt string the file was written with.
+    - schema: Name of an entry of SCHEMAS, or a dict in the same form.
+
+    Returns a DataFrame with the schema columns, in schema order. Times are
+    datetime64[s] and lead times integer hours; format_time_columns turns
+    the times into text for export. The error report of the parse is kept
+    in df.attrs['errors'].
+    """
+    schema, _ = _resolve_schema(schema, in_fmt)
+    points = parsed['points']
+    storm_start = parsed['storm_start'][points['storm'] - parsed['first_storm']]
+
+    derived = {
+        'storm_id': lambda: points['storm'] + 1,
+        'valid_time': lambda: points['time'],
+        'storm_start': lambda: storm_start,
+        'lead_hours': lambda: (points['time'] - storm_start) // np.timedelta64(1, 'h'),
+    }
+    data = {}
+    for name, field in schema.items():
+        if field in derived:
+            data[name] = derived[field]()
+        else:
+            data[name] = points[field.lower()]
+    df = pd.DataFrame(data)
+    df.attrs['errors'] = parsed.get('errors', empty_errors())
+    return df
+
+
+def read_trajectories(filename, in_fmt=DEFAULT_IN_FMT, schema='label'):
+    """
+    Read a StitchNodes trajectory file into a DataFrame.
+
+    Parameters:
+    - filename: Path to the .dat file written by StitchNodes.
+    - in_fmt: The --in_fmt string passed to StitchNodes.
+    - schema: Output columns, see trajectory_frame.
+    """
+    # Fail on a bad schema before reading a large file
+    _resolve_schema(schema, in_fmt)
+    return trajectory_frame(parse_trajectories(filename, in_fmt), in_fmt, schema)
+
+
+def read_format_(filename):
+    """
+    Read a StitchNodes trajectory file written with
+    --in_fmt "lon,lat,slp,wind,PHIS" into the label_data DataFrame.
+    """
+    return read_trajectories(filename)
+
+
+def write_trajectory_csv(filename, output_path, storms_per_chunk=STORMS_PER_CHUNK,
+                         in_fmt=DEFAULT_IN_FMT, schema='label'):
+    """
+    Convert a trajectory file to CSV chunk by chunk.
+
+    Only one chunk of storms is held in memory at a time, so arbitrarily
+    large trajectory files convert with constant memory.
+
+    Parameters:
+    - filename: Path to the .dat file written by StitchNodes.
+    - output_path: Path of the CSV file to write.
+    - storms_per_chunk: Number of storms converted per chunk.
+    - in_fmt: The --in_fmt string passed to StitchNodes.
+    - schema: Output columns, see trajectory_frame (label_data layout by default).
+
+    Returns the number of points written and the error report of the parse.
+    """
+    _resolve_schema(schema, in_fmt)
+    n_points = 0
+    errors = empty_errors()
+    with open(output_path, 'w', newline='') as out:
+        header = True
+        for chunk in iter_trajectory_chunks(filename, storms_per_chunk=storms_per_chunk, in_fmt=in_fmt):
+            df = format_time_columns(trajectory_frame(chunk, in_fmt, schema))
+            df.to_csv(out, index=False, header=header)
+            header = False
+            n_points += len(df)
+            errors = merge_errors(errors, chunk['errors'])
+        if header:
+            format_time_columns(trajectory_frame(_parse_buffer(b'', in_fmt=in_fmt), in_fmt, schema)).to_csv(out, index=False)
+    return n_points, errors
@@ -0,0 +1,358 @@
+"""
+Lead-time verification of forecast storm tracks.
+
+The daily-initialized NeuralGCM runs (11.14 full_sim.py) give one track
+file per initialization (12.5 label_data.py). verify_forecasts matches the
+tracks of all initializations against reference tracks in one
+stormtools.matching call and places every matched pair on a common 6-hour
+grid, in dense (forecast, storm, lead) arrays: forecast f, reference storm
+s and lead time l. A reference value at lead l of forecast f is gathered
+from a (storm, valid time) array at column init_f + l, so the alignment
+is one fancy-indexing step for the whole month instead of a merge per
+forecast and storm.
+
+Errors are then array arithmetic on the cube, and skill_curves reduces
+them over the forecast and storm axes:
+
+- track error: great-circle distance between forecast and reference centre;
+- along-track and cross-track error: the position error split along the
+  reference direction of motion (positive ahead of the storm) and across
+  it (positive to the right of the motion), on the local tangent plane;
+- pressure and wind bias: forecast minus reference.
+
+Run with
+
+    python -m stormtools.verification processed_results/*.npz --reference era5_tracks.npz --output skill.csv
+"""
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from stormtools.matching import MATCH_RADIUS_KM, MIN_MATCH_FRACTION, ibtracs_period_storms, match_tracks
+from stormtools.trackgeom import EARTH_RADIUS_KM, haversine
+
+LEAD_STEP = np.timedelta64(6, 'h')
+MAX_LEAD_HOURS = 14 * 24  # full_sim.py runs 14-day forecasts
+KNOTS_TO_MS = 0.514444
+
+VALUE_COLUMNS = {
+    'lon': 'lons',
+    'lat': 'lats',
+    'wind': 'wind_speed',
+    'pressure': 'pa',
+}
+
+ERROR_NAMES = ('track_error_km', 'along_track_km', 'cross_track_km', 'pressure_error', 'wind_error')
+
+
+def init_time_from_path(path):
+    """
+    Initialization date in a track file name (e.g. NeuralGCM_2020-07-01),
+    as datetime64[s], or NaT if the name holds no date.
+    """
+    found = re.search(r'(\d{4})-?(\d{2})-?(\d{2})', os.path.basename(str(path)))
+    if found is None:
+        return np.datetime64('NaT', 's')
+    return np.datetime64('-'.join(found.groups()), 's')
+
+
+def ibtracs_reference(ibtracs_path, first_time, last_time, min_wind=34, cache_dir=None):
+    """
+    IBTrACS storms of a period as a reference track DataFrame.
+
+    Parameters:
+    - ibtracs_path: IBTrACS netCDF file or per-season cache.
+    - first_time, last_time: datetime64 bounds of the period.
+    - min_wind: See stormtools.matching.ibtracs_period_storms.
+    - cache_dir: Directory of the IBTrACS caches.
+
+    Returns a DataFrame with 'storm_id' (the IBTrACS sid), 'dates', 'lons',
+    'lats' and 'wind_speed' (usa_wind converted to m/s, as the
+    TempestExtremes winds). The cache holds no pressure, so 'pa' is NaN and
+    pressure biases against IBTrACS are NaN.
+    """
+    points, storms, storm, eligible = ibtracs_period_storms(ibtracs_path, first_time, last_time, min_wind, cache_dir)
+    keep = eligible[storm]
+    points = points[keep]
+    return pd.DataFrame({
+        'storm_id': storms['sid'][storm[keep]].astype(str),
+        'dates': points['time'],
+        'lons': points['lon'].astype(np.float64),
+        'lats': points['lat'].astype(np.float64),
+        'wind_speed': points['usa_wind'].astype(np.float64) * KNOTS_TO_MS,
+        'pa': np.nan,
+    })
+
+
+def _tangent_offsets(lon, lat, lon0, lat0):
+    """
+    East and north offsets in km of (lon, lat) from (lon0, lat0) on the
+    tangent plane at (lon0, lat0); longitudes are wrapped across the dateline.
+    """
+    dlon = (lon - lon0 + 180) % 360 - 180
+    scale = np.radians(1.0) * EARTH_RADIUS_KM
+    return dlon * scale * np.cos(np.radians(lat0)), (lat - lat0) * scale
+
+
+def _motion(lons, lats):
+    """
+    Direction of motion of (storm, time) position arrays: the east and north
+    components in km of the centred difference, or of the one-sided
+    difference at the ends of a track; NaN for isolated points.
+    """
+    # Every step between consecutive times counts for both of its end points
+    de, dn = _tangent_offsets(lons[:, 1:], lats[:, 1:], lons[:, :-1], lats[:, :-1])
+    valid = np.isfinite(de) & np.isfinite(dn)
+    de, dn = np.where(valid, de, 0), np.where(valid, dn, 0)
+    east = np.zeros(lons.shape)
+    north = np.zeros(lons.shape)
+    steps = np.zeros(lons.shape)
+    for end in (np.s_[:, :-1], np.s_[:, 1:]):
+        east[end] += de
+        north[end] += dn
+        steps[end] += valid
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(steps > 0, east / steps, np.nan), np.where(steps > 0, north / steps, np.nan)
+
+
+def verify_forecasts(forecasts, reference, storm_column='storm_id', reference_column='storm_id',
+                     max_lead_hours=MAX_LEAD_HOURS, lead_step=LEAD_STEP, radius_km=MATCH_RADIUS_KM,
+                     min_fraction=MIN_MATCH_FRACTION):
+    """
+    Align the matched tracks of many forecasts with their reference storms.
+
+    Parameters:
+    - forecasts: Sequence of (init_time, DataFrame) pairs, one per
+      initialization, each DataFrame with 'dates', 'lons', 'lats',
+      'wind_speed' and 'pa' columns (see stormtools.trackstore.load_tracks).
+    - reference: DataFrame of reference tracks with the same columns, e.g.
+      tracks of the analysis or ibtracs_reference.
+    - storm_column: Column identifying the tracks of a forecast.
+    - reference_column: Column identifying the reference storms.
+    - max_lead_hours: Longest lead time kept.
+    - lead_step: Spacing of the lead grid; points off the grid are dropped.
+    - radius_km, min_fraction: See stormtools.matching.match_tracks.
+
+    Returns a dict with:
+    - 'init_times' (forecast,), 'storms' (storm,) reference storm keys and
+      'lead_hours' (lead,).
+    - 'forecast' and 'reference': dicts of (forecast, storm, lead) arrays
+      'lon', 'lat', 'wind' and 'pressure', NaN where the forecast track of
+      the storm (its best match within the forecast) or the reference storm
+      has no point.
+    - one (forecast, storm, lead) array per ERROR_NAMES entry, NaN unless
+      both positions are known.
+    - 'matches': the match_tracks table of all forecast tracks, with
+      'forecast' and the storm_column key.
+
+    Forecasts without points on the lead grid, or initialized between its
+    steps, are kept with all-NaN values; with no matched storm at all the
+    arrays have no storms and skill_curves reports zero samples.
+    """
+    init_times = np.array([np.datetime64(init, 's') for init, _ in forecasts], dtype='datetime64[s]')
+    step_hours = lead_step / np.timedelta64(1, 'h')
+    lead_hours = np.arange(0, max_lead_hours + step_hours / 2, step_hours)
+    n_leads = len(lead_hours)
+
+    # All forecast points in one table; a track is one (forecast, storm_column) pair
+    frames = [df.loc[df[storm_column].notna() & df['dates'].notna(), [storm_column, 'dates'] + list(VALUE_COLUMNS.values())]
+              .assign(forecast=f) for f, (_, df) in enumerate(forecasts)]
+    points = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+        columns=['forecast', storm_column, 'dates'] + list(VALUE_COLUMNS.values()))
+    times = points['dates'].values.astype('datetime64[s]')
+    lead = (times - init_times[points['forecast'].values.astype(np.int64)]) / lead_step
+    on_grid = (lead >= 0) & (lead < n_leads) & (lead == np.round(lead))
+    points = points[on_grid]
+    times, lead = times[on_grid], lead[on_grid].astype(np.int64)
+    track, tracks = pd.factorize(pd.MultiIndex.from_arrays([points['forecast'], points[storm_column]]))
+
+    reference = reference[reference[reference_column].notna() & reference['dates'].notna()]
+    ref_storm, storms = pd.factorize(reference[reference_column])
+    ref_times = reference['dates'].values.astype('datetime64[s]')
+
+    matches = match_tracks(track, times, points['lons'].values, points['lats'].values,
+                           ref_storm, ref_times, reference['lons'].values, reference['lats'].values,
+                           radius_km=radius_km, min_fraction=min_fraction, time_step=lead_step)
+    matches.insert(1, 'forecast', tracks.get_level_values(0)[matches['track'].values].astype(np.int64))
+    matches.insert(2, storm_column, tracks.get_level_values(1)[matches['track'].values])
+
+    # One track per (forecast, storm): the one with the most matched points
+    hits = matches[matches['hit']].sort_values('matched_points', ascending=False, kind='mergesort')
+    hits = hits.drop_duplicates(['forecast', 'storm'])
+    slot_storms, slot = np.unique(hits['storm'].values, return_inverse=True)
+    track_slot = np.full(len(matches), -1)
+    track_slot[hits['track'].values] = slot.ravel()
+
+    shape = (len(init_times), len(slot_storms), n_leads)
+    forecast = {name: np.full(shape, np.nan) for name in VALUE_COLUMNS}
+    point_slot = track_slot[track]
+    kept = point_slot >= 0
+    cell = (points['forecast'].values[kept].astype(np.int64), point_slot[kept], lead[kept])
+    for name, column in VALUE_COLUMNS.items():
+        forecast[name][cell] = points[column].values[kept]
+
+    # Reference storms on a (storm, valid time) grid covering every init_f + lead.
+    # The grid holds the multiples of lead_step, so a forecast initialized
+    # between them has no reference and stays NaN
+    result = {'init_times': init_times, 'storms': np.asarray(storms)[slot_storms], 'lead_hours': lead_hours,
+              'forecast': forecast, 'matches': matches}
+    reference_cube = {name: np.full(shape, np.nan) for name in VALUE_COLUMNS}
+    init_offset = (init_times - np.datetime64(0, 's')) / lead_step
+    aligned = init_offset == np.round(init_offset)
+    if aligned.any() and len(slot_storms):
+        first_init = np.datetime64(0, 's') + int(init_offset[aligned].min()) * lead_step
+        init_index = np.where(aligned, np.round((init_times - first_init) / lead_step), 0).astype(np.int64)
+        n_times = int(init_index.max()) + n_leads
+        storm_slot = np.full(len(storms), -1)
+        storm_slot[slot_storms] = np.arange(len(slot_storms))
+        ref_slot = storm_slot[ref_storm]
+        valid_index = (ref_times - first_init) / lead_step
+        on_grid = (ref_slot >= 0) & (valid_index >= 0) & (valid_index < n_times) & (valid_index == np.round(valid_index))
+        ref_cell = (ref_slot[on_grid], valid_index[on_grid].astype(np.int64))
+        grid = {}
+        for name, column in VALUE_COLUMNS.items():
+            grid[name] = np.full((len(slot_storms), n_times), np.nan)
+            grid[name][ref_cell] = reference[column].values[on_grid]
+        grid['motion_east'], grid['motion_north'] = _motion(grid['lon'], grid['lat'])
+
+        storm_index = np.arange(len(slot_storms))[None, :, None]
+        time_index = init_index[:, None, None] + np.arange(n_leads)[None, None, :]
+        gathered = {name: np.where(aligned[:, None, None], values[storm_index, time_index], np.nan)
+                    for name, values in grid.items()}
+        motion_east, motion_north = gathered.pop('motion_east'), gathered.pop('motion_north')
+        reference_cube = gathered
+    else:
+        motion_east = motion_north = np.full(shape, np.nan)
+    result['reference'] = reference_cube
+
+    # Errors of the whole cube at once
+    east, north = _tangent_offsets(forecast['lon'], forecast['lat'], reference_cube['lon'], reference_cube['lat'])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        speed = np.hypot(motion_east, motion_north)
+        result['track_error_km'] = haversine(forecast['lon'], forecast['lat'], reference_cube['lon'], reference_cube['lat'])
+        result['along_track_km'] = np.where(speed > 0, (east * motion_east + north * motion_north) / speed, np.nan)
+        result['cross_track_km'] = np.where(speed > 0, (east * motion_north - north * motion_east) / speed, np.nan)
+    result['pressure_error'] = forecast['pressure'] - reference_cube['pressure']
+    result['wind_error'] = forecast['wind'] - reference_cube['wind']
+    return result
+
+
+def _mean(values, axis):
+    """
+    Mean over axis ignoring NaN, NaN where no value is finite.
+    """
+    valid = np.isfinite(values)
+    count = valid.sum(axis=axis)
+    total = np.where(valid, values, 0).sum(axis=axis)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(count > 0, total / count, np.nan)
+
+
+def skill_curves(verification):
+    """
+    Mean errors per lead time over every forecast and storm.
+
+    Parameters:
+    - verification: dict returned by verify_forecasts.
+
+    Returns a DataFrame indexed by 'lead_hours' with 'samples' (pairs with a
+    track error), 'forecasts' and 'storms' (distinct forecasts and storms
+    among them), the mean 'track_error_km', the mean ('..._bias') and mean
+    absolute ('..._error') along-track and cross-track errors, and the
+    pressure and wind bias and mean absolute error.
+    """
+    axes = (0, 1)
+    sampled = np.isfinite(verification['track_error_km'])
+    curves = {
+        'samples': sampled.sum(axis=axes),
+        'forecasts': sampled.any(axis=1).sum(axis=0),
+        'storms': sampled.any(axis=0).sum(axis=0),
+        'track_error_km': _mean(verification['track_error_km'], axes),
+    }
+    for name, label in (('along_track_km', 'along_track'), ('cross_track_km', 'cross_track')):
+        curves[f'{label}_bias_km'] = _mean(verification[name], axes)
+        curves[f'{label}_error_km'] = _mean(np.abs(verification[name]), axes)
+    for name, label in (('pressure_error', 'pressure'), ('wind_error', 'wind')):
+        curves[f'{label}_bias'] = _mean(verification[name], axes)
+        curves[f'{label}_mae'] = _mean(np.abs(verification[name]), axes)
+    return pd.DataFrame(curves, index=pd.Index(verification['lead_hours'], name='lead_hours'))
+
+
+def verify_files(paths, reference=None, ibtracs_path=None, storm_column='storm_id', reference_column='storm_id',
+                 max_lead_hours=MAX_LEAD_HOURS, min_wind=34, radius_km=MATCH_RADIUS_KM,
+                 min_fraction=MIN_MATCH_FRACTION, cache_dir=None):
+    """
+    verify_forecasts for converted track files, one per initialization.
+
+    Parameters:
+    - paths: Track files (see load_tracks); the initialization time is the
+      date in the file name, else the first time in the file.
+    - reference: Reference track file, or None to verify against IBTrACS.
+    - ibtracs_path: IBTrACS netCDF file or cache, used without reference.
+    - min_wind, cache_dir: IBTrACS storm selection (see ibtracs_reference).
+    - Other parameters: See verify_forecasts.
+
+    Returns the dict of verify_forecasts.
+    """
+    from stormtools.trackstore import load_tracks
+
+    if reference is None and ibtracs_path is None:
+        raise ValueError("Either a reference track file or an IBTrACS file is needed")
+    forecasts = []
+    for path in paths:
+        df = load_tracks(path)
+        init_time = init_time_from_path(path)
+        if np.isnat(init_time):
+            init_time = df['dates'].values.astype('datetime64[s]').min()
+        forecasts.append((init_time, df))
+
+    if reference is not None:
+        reference_df = load_tracks(reference)
+    else:
+        init_times = np.array([init for init, _ in forecasts], dtype='datetime64[s]')
+        reference_df = ibtracs_reference(ibtracs_path, init_times.min(),
+                                         init_times.max() + np.timedelta64(int(max_lead_hours), 'h'),
+                                         min_wind, cache_dir)
+        reference_column = 'storm_id'
+    return verify_forecasts(forecasts, reference_df, storm_column, reference_column, max_lead_hours,
+                            radius_km=radius_km, min_fraction=min_fraction)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Track and intensity errors of forecast tracks by lead time")
+    parser.add_argument('forecasts', nargs='+', type=str, help='Converted forecast track files, one per initialization')
+    parser.add_argument('--reference', type=str, default=None, help='Converted reference track file')
+    parser.add_argument('--ibtracs', type=str, default=None, help='IBTrACS netCDF file, used without --reference')
+    parser.add_argument('--storm-column', type=str, default='storm_id', help='Column identifying the forecast tracks')
+    parser.add_argument('--reference-column', type=str, default='storm_id',
+                        help='Column identifying the reference storms')
+    parser.add_argument('--max-lead', type=float, default=MAX_LEAD_HOURS, help='Longest lead time in hours')
+    parser.add_argument('--radius', type=float, default=MATCH_RADIUS_KM, help='Matching radius in km')
+    parser.add_argument('--min-fraction', type=float, default=MIN_MATCH_FRACTION,
+                        help='Fraction of matched points for a hit')
+    parser.add_argument('--output', type=str, default=None, help='CSV file to write the skill curves in')
+    args = parser.parse_args(argv)
+    if args.reference is None and args.ibtracs is None:
+        parser.error('one of --reference or --ibtracs is required')
+
+    start_time = time.perf_counter()
+    verification = verify_files(args.forecasts, args.reference, args.ibtracs, args.storm_column,
+                                args.reference_column, args.max_lead, radius_km=args.radius,
+                                min_fraction=args.min_fraction)
+    curves = skill_curves(verification)
+    print(f"{len(verification['init_times'])} forecasts, {len(verification['storms'])} matched storms "
+          f"({time.perf_counter() - start_time:.1f} s)")
+    print(curves[curves['samples'] > 0].to_string(float_format='{:.1f}'.format))
+    if args.output:
+        curves.to_csv(args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())